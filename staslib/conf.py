@@ -8,18 +8,13 @@
 #
 '''nvme-stas configuration module'''
 
-import re
 import os
 import sys
 import logging
 import functools
-import configparser
 from urllib.parse import urlparse
 from staslib import defs, iputil, nbft, singleton, timeparse
 
-__TOKEN_RE = re.compile(r'\s*;\s*')
-__OPTION_RE = re.compile(r'\s*=\s*')
-
 
 class InvalidOption(Exception):
     '''Exception raised when an invalid option value is detected'''
@@ -32,16 +27,13 @@ def _parse_controller(controller):
            "key=value" pair.
     @return A dictionary of key-value pairs.
     '''
-    options = dict()
-    tokens = __TOKEN_RE.split(controller)
-    for token in tokens:
-        if token:
-            try:
-                option, val = __OPTION_RE.split(token)
-                options[option.strip()] = val.strip()
-            except ValueError:
-                pass
-
+    options = {}
+    for token in controller.split(';'):
+        key, sep, val = token.partition('=')
+        if sep:
+            key = key.strip()
+            if key:
+                options[key] = val.strip()
     return options
 
 
@@ -80,29 +72,81 @@ def _to_ip_family(text):
     return tuple((4 if text == 'ipv4' else 6 for text in _parse_single_val(text).split('+')))
 
 
-# ******************************************************************************
-class OrderedMultisetDict(dict):
-    '''This class is used to change the behavior of configparser.ConfigParser
-    and allow multiple configuration parameters with the same key. The
-    result is a list of values, where values are sorted by the order they
-    appear in the file.
+def _read_ini(fname):
+    '''@brief Read an INI-style configuration file. Options are case
+           insensitive (i.e. converted to lower case) and may be repeated,
+           in which case all the values are kept in the order they appear in
+           the file. Indented lines that follow an option are continuation
+           lines and are added to that option's values. Empty lines and
+           comment lines (i.e. starting with "#" or ";") are ignored. Options
+           that appear before the first [section] are ignored with a warning.
+           A file that cannot be read is reported and treated as empty.
+           Section and option names are interned so that lookups with the
+           (interned) string literals used throughout the code are resolved
+           by identity.
+    @return A dictionary of sections. Each section is a dictionary that maps
+            options to their list of values, or to None for options
+            specified without "=value".
     '''
+    config = {}
+    section = None
+    values = None  # The values of the last option read (for continuation lines)
+    values_indent = 0
+    try:
+        with open(fname) as file:  # pylint: disable=unspecified-encoding
+            for lineno, line in enumerate(file, 1):
+                text = line.strip()
+                if not text or text[0] in '#;':
+                    continue
+
+                indent = len(line) - len(line.lstrip())
+                if values is not None and indent > values_indent:
+                    values.append(text)
+                    continue
+
+                values = None
+                if text[0] == '[' and ']' in text:
+                    section = config.setdefault(sys.intern(text[1 : text.rindex(']')]), {})
+                    continue
+
+                if section is None:
+                    logging.warning(
+                        'File:%s line %s is not in a [section] and will be ignored: %s', fname, lineno, text
+                    )
+                    continue
 
-    def __setitem__(self, key, value):
-        if key in self and isinstance(value, list):
-            self[key].extend(value)
-        else:
-            super().__setitem__(key, value)
+                option, sep, value = text.partition('=')
+                option = sys.intern(option.rstrip().lower())
+                if not option:
+                    continue
 
-    def __getitem__(self, key):
-        value = super().__getitem__(key)
+                if not sep:
+                    section[option] = None
+                    continue
 
-        if isinstance(value, str):
-            return value.split('\n')
+                values = section.get(option)
+                if values is None:
+                    values = section[option] = []
+                values.append(value.lstrip())
+                values_indent = indent
+    except (OSError, UnicodeError) as ex:
+        logging.error('File:%s cannot be read: %s', fname, ex)
+        return {}
+
+    return config
 
-        return value
+
+def _file_signature(fname):
+    '''@brief Return a value that changes whenever file @fname is modified or
+    replaced, or None if the file cannot be stat'ed.'''
+    try:
+        stat = os.stat(fname)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (fname, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
 
 
+# ******************************************************************************
 class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public-methods
     '''Read and cache configuration file.'''
 
@@ -230,6 +274,8 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
 
     def __init__(self, default_conf=None, conf_file='/dev/null'):
         self._config = None
+        self._conf_signature = None
+        self._cache = {}  # get_option() results and parsed controller lists. Cleared when the file is parsed.
         self._defaults = default_conf if default_conf else {}
 
         if self._defaults is not None and len(self._defaults) != 0:
@@ -243,22 +289,44 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
         self.reload()
 
     def reload(self):
-        '''@brief Reload the configuration file.'''
-        self._config = self._read_conf_file()
+        '''@brief Reload the configuration file. The file is only parsed
+        again if it has changed since it was last read.'''
+        signature = _file_signature(self._conf_file)
+        if signature is None or signature != self._conf_signature:
+            self._conf_signature = signature
+            self._config = self._read_conf_file()
+            self._cache.clear()
 
     @property
     def conf_file(self):
         '''Return the configuration file name'''
         return self._conf_file
 
+    @property
+    def conf_signature(self):
+        '''Return a value that changes every time the configuration file
+        gets parsed with different contents (see _file_signature()).'''
+        return self._conf_signature
+
     def set_conf_file(self, fname):
         '''Set the configuration file name and reload config'''
         self._conf_file = fname
         self.reload()
 
-    def get_option(self, section, option, ignore_default=False):  # pylint: disable=too-many-locals
+    def get_option(self, section, option, ignore_default=False):
         '''Retrieve @option from @section, convert raw text to
-        appropriate object type, and validate.'''
+        appropriate object type, and validate. The result is cached
+        until the configuration file is reloaded. Callers get their
+        own copy of list values.'''
+        key = (section, option, ignore_default)
+        try:
+            value = self._cache[key]
+        except KeyError:
+            value = self._cache[key] = self._get_option(section, option, ignore_default)
+
+        return value.copy() if isinstance(value, list) else value
+
+    def _get_option(self, section, option, ignore_default):  # pylint: disable=too-many-locals
         try:
             checker = self.OPTION_CHECKER[section][option]
         except KeyError:
@@ -267,12 +335,11 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
 
         default = checker.get('default', None)
 
-        try:
-            text = self._config.get(section=section, option=option)
-        except (configparser.NoSectionError, configparser.NoOptionError, KeyError):
+        options = self._config.get(section)
+        if options is None or option not in options:
             return None if ignore_default else self._defaults.get((section, option), default)
 
-        return self._check(text, section, option, default)
+        return self._check(options[option], section, option, default)
 
     tron = property(functools.partial(get_option, section='Global', option='tron'))
     kato = property(functools.partial(get_option, section='Global', option='kato'))
@@ -353,15 +420,20 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
             'ctrl-loss-tmo':      [SECONDS]
             'disable-sqflow':     [BOOL]
         }
+        The list is cached until the configuration file is reloaded. Callers
+        get their own copy of the list, but the dictionaries are shared and
+        must not be modified.
         '''
+        cids = self._cache.get('controllers')
+        if cids is not None:
+            return cids.copy()
+
         controller_list = self.get_option('Controllers', 'controller')
         cids = [_parse_controller(controller) for controller in controller_list]
         for cid in cids:
-            try:
-                # replace 'nqn' key by 'subsysnqn', if present.
+            if 'nqn' in cid:
+                # replace 'nqn' key by 'subsysnqn'
                 cid['subsysnqn'] = cid.pop('nqn')
-            except KeyError:
-                pass
 
             # Verify values of the options used to overload the matching [Global] options
             for option in cid:
@@ -370,7 +442,8 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
                     if value is not None:
                         cid[option] = value
 
-        return cids
+        self._cache['controllers'] = cids
+        return cids.copy()
 
     def get_excluded(self):
         '''@brief Return the list of excluded controllers in the config file.
@@ -383,22 +456,27 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
             'host-iface': [IFACE],
             'subsysnqn':  [NQN],
         }
+        The list is cached until the configuration file is reloaded. Callers
+        get their own copy of the list, but the dictionaries are shared and
+        must not be modified.
         '''
-        controller_list = self.get_option('Controllers', 'exclude')
+        excluded = self._cache.get('excluded')
+        if excluded is not None:
+            return excluded.copy()
 
         # 2022-09-20: Look for "blacklist". This is for backwards compatibility
         # with releases 1.0 to 1.1.x. This is to be phased out (i.e. remove by 2024)
-        controller_list += self.get_option('Controllers', 'blacklist')
+        controller_list = self.get_option('Controllers', 'exclude') + self.get_option('Controllers', 'blacklist')
 
         excluded = [_parse_controller(controller) for controller in controller_list]
         for controller in excluded:
             controller.pop('host-traddr', None)  # remove host-traddr
-            try:
-                # replace 'nqn' key by 'subsysnqn', if present.
+            if 'nqn' in controller:
+                # replace 'nqn' key by 'subsysnqn'
                 controller['subsysnqn'] = controller.pop('nqn')
-            except KeyError:
-                pass
-        return excluded
+
+        self._cache['excluded'] = excluded
+        return excluded.copy()
 
     def _check(self, text, section, option, default):
         checker = self.OPTION_CHECKER[section][option]
@@ -465,26 +543,17 @@ class SvcConf(metaclass=singleton.Singleton):  # pylint: disable=too-many-public
 
     def _read_conf_file(self):
         '''@brief Read the configuration file if the file exists.'''
-        config = configparser.ConfigParser(
-            default_section=None,
-            allow_no_value=True,
-            delimiters=('='),
-            interpolation=None,
-            strict=False,
-            dict_type=OrderedMultisetDict,
-        )
-        if self._conf_file and os.path.isfile(self._conf_file):
-            config.read(self._conf_file)
+        config = _read_ini(self._conf_file) if self._conf_file and os.path.isfile(self._conf_file) else {}
 
         # Parse Configuration and validate.
         if self._valid_conf is not None:
             invalid_sections = set()
-            for section in config.sections():
+            for section, options in config.items():
                 if section not in self._valid_conf:
                     invalid_sections.add(section)
                 else:
                     invalid_options = set()
-                    for option in config.options(section):
+                    for option in options:
                         if option not in self._valid_conf.get(section, []):
                             invalid_options.add(option)
 
@@ -512,12 +581,21 @@ class SysConf(metaclass=singleton.Singleton):
 
     def __init__(self, conf_file=defs.SYS_CONF_FILE):
         self._config = None
+        self._conf_signature = None
+        self._cache = {}  # (section, option) -> value
         self._conf_file = conf_file
         self.reload()
 
     def reload(self):
-        '''@brief Reload the configuration file.'''
-        self._config = self._read_conf_file()
+        '''@brief Reload the configuration file. The file is only parsed
+        again if it has changed since it was last read. Cached values are
+        always dropped since they may come from other files (e.g.
+        /etc/nvme/hostnqn).'''
+        self._cache.clear()
+        signature = _file_signature(self._conf_file)
+        if signature is None or signature != self._conf_signature:
+            self._conf_signature = signature
+            self._config = self._read_conf_file()
 
     @property
     def conf_file(self):
@@ -598,14 +676,21 @@ class SysConf(metaclass=singleton.Singleton):
 
     def _read_conf_file(self):
         '''@brief Read the configuration file if the file exists.'''
-        config = configparser.ConfigParser(
-            default_section=None, allow_no_value=True, delimiters=('='), interpolation=None, strict=False
-        )
-        if os.path.isfile(self._conf_file):
-            config.read(self._conf_file)
-        return config
+        return _read_ini(self._conf_file) if os.path.isfile(self._conf_file) else {}
 
     def __get_value(self, section, option, default_file=None):
+        '''@brief Same as __read_value(), but the value is cached until the
+        next reload(). Exceptions are not cached.'''
+        key = (section, option)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        value = self._cache[key] = self.__read_value(section, option, default_file)
+        return value
+
+    def __read_value(self, section, option, default_file=None):
         '''@brief A configuration file consists of sections, each led by a
                [section] header, followed by key/value entries separated
                by a equal sign (=). This method retrieves the value
@@ -625,12 +710,13 @@ class SysConf(metaclass=singleton.Singleton):
         @raise: This method will raise the FileNotFoundError exception if
                 the value retrieved is a file that does not exist.
         '''
-        try:
-            value = self._config.get(section=section, option=option)
+        values = self._config.get(section, {}).get(option)  # None if missing or defined without a value
+        if values:
+            value = values[-1]  # The last definition wins
             if not value.startswith('file://'):
                 return value
             file = value[7:]
-        except (configparser.NoSectionError, configparser.NoOptionError, KeyError):
+        else:
             if default_file is None:
                 return None
             file = default_file
@@ -643,6 +729,16 @@ class SysConf(metaclass=singleton.Singleton):
 
 
 # ******************************************************************************
+# The running kernel does not change. Compare its version against the
+# minimum version required by each option once, when the module is loaded.
+_OPTIONS_SUPPORTED_BY_KERNEL_VERSION = {
+    'discovery': defs.KERNEL_VERSION >= defs.KERNEL_TP8013_MIN_VERSION,
+    'host_iface': defs.KERNEL_VERSION >= defs.KERNEL_IFACE_MIN_VERSION,
+    'dhchap_secret': defs.KERNEL_VERSION >= defs.KERNEL_HOSTKEY_MIN_VERSION,
+    'dhchap_ctrl_secret': defs.KERNEL_VERSION >= defs.KERNEL_CTRLKEY_MIN_VERSION,
+}
+
+
 class NvmeOptions(metaclass=singleton.Singleton):
     '''Object used to read and cache contents of file /dev/nvme-fabrics.
     Note that this file was not readable prior to Linux 5.16.
@@ -655,12 +751,7 @@ class NvmeOptions(metaclass=singleton.Singleton):
         # have been backported to older kernels. In any case, if the kernel
         # version meets the minimum version for that option, then we don't
         # even need to read '/dev/nvme-fabrics'.
-        self._supported_options = {
-            'discovery': defs.KERNEL_VERSION >= defs.KERNEL_TP8013_MIN_VERSION,
-            'host_iface': defs.KERNEL_VERSION >= defs.KERNEL_IFACE_MIN_VERSION,
-            'dhchap_secret': defs.KERNEL_VERSION >= defs.KERNEL_HOSTKEY_MIN_VERSION,
-            'dhchap_ctrl_secret': defs.KERNEL_VERSION >= defs.KERNEL_CTRLKEY_MIN_VERSION,
-        }
+        self._supported_options = dict(_OPTIONS_SUPPORTED_BY_KERNEL_VERSION)
 
         # If some of the options are False, we need to check whether they can be
         # read from '/dev/nvme-fabrics'. This method allows us to determine that
@@ -669,7 +760,7 @@ class NvmeOptions(metaclass=singleton.Singleton):
         if not all(self._supported_options.values()):  # At least one option is False.
             try:
                 with open('/dev/nvme-fabrics') as f:  # pylint: disable=unspecified-encoding
-                    options = [option.split('=')[0].strip() for option in f.readline().rstrip('\n').split(',')]
+                    options = {option.partition('=')[0].strip() for option in f.readline().split(',')}
             except PermissionError:  # Must be root to read this file
                 raise
             except (OSError, FileNotFoundError):
@@ -12,11 +12,12 @@ Dc (Discovery Controller) and Ioc (I/O Controller) objects are derived.'''
 import time
 import inspect
 import logging
-from gi.repository import GLib
 from libnvme import nvme
 from staslib import conf, defs, gutil, trid, udev, stas
 
 
+DETAILS_UDEV_ATTRS = ('hostid', 'hostnqn', 'model', 'serial', 'dctype', 'cntrltype')
+
 DLP_CHANGED = (
     (nvme.NVME_LOG_LID_DISCOVER << 16) | (nvme.NVME_AER_NOTICE_DISC_CHANGED << 8) | nvme.NVME_AER_NOTICE
 )  # 0x70f002
@@ -48,9 +49,26 @@ def dlp_supp_opts_as_string(dlp_supp_opts: int):
 class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attributes
     '''@brief Base class used to manage the connection to a controller.'''
 
+    __slots__ = ('_nvme_options', '_host_iface', '_root', '_host', '_udev', '_device', '_ctrl', '_connect_op')
+
+    CFG_OPTIONS = (  # (configuration option, libnvme keyword)
+        ('kato', 'keep_alive_tmo'),
+        ('queue-size', 'queue_size'),
+        ('hdr-digest', 'hdr_digest'),
+        ('data-digest', 'data_digest'),
+        ('nr-io-queues', 'nr_io_queues'),
+        ('ctrl-loss-tmo', 'ctrl_loss_tmo'),
+        ('disable-sqflow', 'disable_sqflow'),
+        ('nr-poll-queues', 'nr_poll_queues'),
+        ('nr-write-queues', 'nr_write_queues'),
+        ('reconnect-delay', 'reconnect_delay'),
+    )
+
     def __init__(self, tid: trid.TID, service, discovery_ctrl: bool = False):
         sysconf = conf.SysConf()
         self._nvme_options = conf.NvmeOptions()
+        # Kernel support for host-iface is fixed for the life of the process
+        self._host_iface = tid.host_iface if (tid.host_iface and self._nvme_options.host_iface_supp) else None
         self._root = nvme.root()
         self._host = nvme.host(
             self._root, hostnqn=sysconf.hostnqn, hostid=sysconf.hostid, hostsymname=sysconf.hostsymname
@@ -64,7 +82,8 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         super().__init__(tid, service, discovery_ctrl)
 
     def _release_resources(self):
-        logging.debug('Controller._release_resources()    - %s | %s', self.id, self.device)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Controller._release_resources()    - %s | %s', self.id, self.device)
 
         if self._udev:
             self._udev.unregister_for_device_events(self._on_udev_notification)
@@ -105,9 +124,7 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
     def details(self) -> dict:
         '''@brief return detailed debug info about this controller'''
         details = super().details()
-        details.update(
-            self._udev.get_attributes(self.device, ('hostid', 'hostnqn', 'model', 'serial', 'dctype', 'cntrltype'))
-        )
+        details.update(self._udev.get_attributes(self.device, DETAILS_UDEV_ATTRS))
         details['connected'] = str(self.connected())
         return details
 
@@ -156,7 +173,7 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         elif udev_obj.action == 'remove':
             logging.info('%s | %s - Received "remove" event', self.id, udev_obj.sys_name)
             self._on_ctrl_removed(udev_obj)
-        else:
+        elif logging.getLogger().isEnabledFor(logging.DEBUG):
             logging.debug(
                 'Controller._on_udev_notification() - %s | %s: Received "%s" event',
                 self.id,
@@ -181,24 +198,15 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         '''
         cfg = {}
         service_conf = conf.SvcConf()
-        for option, keyword in (
-            ('kato', 'keep_alive_tmo'),
-            ('queue-size', 'queue_size'),
-            ('hdr-digest', 'hdr_digest'),
-            ('data-digest', 'data_digest'),
-            ('nr-io-queues', 'nr_io_queues'),
-            ('ctrl-loss-tmo', 'ctrl_loss_tmo'),
-            ('disable-sqflow', 'disable_sqflow'),
-            ('nr-poll-queues', 'nr_poll_queues'),
-            ('nr-write-queues', 'nr_write_queues'),
-            ('reconnect-delay', 'reconnect_delay'),
-        ):
+        tid_cfg = self.tid.cfg
+        for option, keyword in Controller.CFG_OPTIONS:
             # Check if the value is defined as a "controller" entry (i.e. override)
-            ovrd_val = self.tid.cfg.get(option, None)
+            ovrd_val = tid_cfg.get(option)
             if ovrd_val is not None:
                 cfg[keyword] = ovrd_val
             else:
-                # Check if the value is found in the [Global] section.
+                # Check if the value is found in the [Global] section. SvcConf
+                # caches get_option() results until the configuration is reloaded.
                 glob_val = service_conf.get_option('Global', option)
                 if glob_val is not None:
                     cfg[keyword] = glob_val
@@ -206,19 +214,17 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         return cfg
 
     def _do_connect(self):
-        service_conf = conf.SvcConf()
-        host_iface = (
-            self.tid.host_iface
-            if (self.tid.host_iface and not service_conf.ignore_iface and self._nvme_options.host_iface_supp)
-            else None
-        )
+        tid = self.tid
+        host_iface = self._host_iface
+        if host_iface and conf.SvcConf().ignore_iface:  # ignore-iface can change on reload
+            host_iface = None
         self._ctrl = nvme.ctrl(
             self._root,
-            subsysnqn=self.tid.subsysnqn,
-            transport=self.tid.transport,
-            traddr=self.tid.traddr,
-            trsvcid=self.tid.trsvcid if self.tid.trsvcid else None,
-            host_traddr=self.tid.host_traddr if self.tid.host_traddr else None,
+            subsysnqn=tid.subsysnqn,
+            transport=tid.transport,
+            traddr=tid.traddr,
+            trsvcid=tid.trsvcid if tid.trsvcid else None,
+            host_traddr=tid.host_traddr if tid.host_traddr else None,
             host_iface=host_iface,
         )
         self._ctrl.discovery_ctrl_set(self._discovery_ctrl)
@@ -226,7 +232,7 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         # Set the DHCHAP key on the controller
         # NOTE that this will eventually have to
         # change once we have support for AVE (TP8019)
-        ctrl_dhchap_key = self.tid.cfg.get('dhchap-ctrl-secret')
+        ctrl_dhchap_key = tid.cfg.get('dhchap-ctrl-secret')
         if ctrl_dhchap_key and self._nvme_options.dhchap_ctrlkey_supp:
             has_dhchap_key = hasattr(self._ctrl, 'dhchap_key')
             if not has_dhchap_key:
@@ -271,12 +277,13 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         self._connect_op = None
 
         if not self._alive():
-            logging.debug(
-                'Controller._on_connect_success()   - %s | %s: Received event on dead object. data=%s',
-                self.id,
-                self.device,
-                data,
-            )
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(
+                    'Controller._on_connect_success()   - %s | %s: Received event on dead object. data=%s',
+                    self.id,
+                    self.device,
+                    data,
+                )
             return
 
         self._device = self._ctrl.name
@@ -290,12 +297,13 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         self._connect_op = None
 
         if not self._alive():
-            logging.debug(
-                'Controller._on_connect_fail()      - %s Received event on dead object. %s %s',
-                self.id,
-                err.domain,
-                err.message,
-            )
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(
+                    'Controller._on_connect_fail()      - %s Received event on dead object. %s %s',
+                    self.id,
+                    err.domain,
+                    err.message,
+                )
             return
 
         if self._connect_attempts == 1:
@@ -308,12 +316,13 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
             logging.error('%s Failed to connect to controller. %s %s', self.id, err.domain, err.message)
 
         if self._should_try_to_reconnect():
-            logging.debug(
-                'Controller._on_connect_fail()      - %s %s. Retry in %s sec.',
-                self.id,
-                err,
-                self._retry_connect_tmr.get_timeout(),
-            )
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(
+                    'Controller._on_connect_fail()      - %s %s. Retry in %s sec.',
+                    self.id,
+                    err,
+                    self._retry_connect_tmr.get_timeout(),
+                )
             self._retry_connect_tmr.start()
 
     def disconnect(self, disconnected_cb, keep_connection):
@@ -341,7 +350,7 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
             # cannot be called directly as the current Controller object is in the
             # process of being disconnected and the callback will in fact delete
             # the object. This would invariably lead to unpredictable outcome.
-            GLib.idle_add(disconnected_cb, self, True)
+            gutil.Deferred(disconnected_cb, self, True).schedule()
 
     def _on_disconn_success(self, op_obj: gutil.AsyncTask, data, disconnected_cb):  # pylint: disable=unused-argument
         logging.debug('Controller._on_disconn_success()   - %s | %s', self.id, self.device)
@@ -350,18 +359,19 @@ class Controller(stas.ControllerABC):  # pylint: disable=too-many-instance-attri
         # cannot be called directly as the current Controller object is in the
         # process of being disconnected and the callback will in fact delete
         # the object. This would invariably lead to unpredictable outcome.
-        GLib.idle_add(disconnected_cb, self, True)
+        gutil.Deferred(disconnected_cb, self, True).schedule()
 
     def _on_disconn_fail(
         self, op_obj: gutil.AsyncTask, err, fail_cnt, disconnected_cb
     ):  # pylint: disable=unused-argument
-        logging.debug('Controller._on_disconn_fail()      - %s | %s: %s', self.id, self.device, err)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Controller._on_disconn_fail()      - %s | %s: %s', self.id, self.device, err)
         op_obj.kill()
         # Defer callback to the next main loop's idle period. The callback
         # cannot be called directly as the current Controller object is in the
         # process of being disconnected and the callback will in fact delete
         # the object. This would invariably lead to unpredictable outcome.
-        GLib.idle_add(disconnected_cb, self, False)
+        gutil.Deferred(disconnected_cb, self, False).schedule()
 
 
 # ******************************************************************************
@@ -372,6 +382,16 @@ class Dc(Controller):
     the cached discovery log pages accordingly.
     '''
 
+    __slots__ = (
+        '_register_op',
+        '_get_supported_op',
+        '_get_log_op',
+        '_origin',
+        '_log_pages',
+        '_ctrl_unresponsive_time',
+        '_ctrl_unresponsive_tmr',
+    )
+
     GET_LOG_PAGE_RETRY_RERIOD_SEC = 20
     REGISTRATION_RETRY_RERIOD_SEC = 5
     GET_SUPPORTED_RETRY_RERIOD_SEC = 5
@@ -393,7 +413,8 @@ class Dc(Controller):
         self._ctrl_unresponsive_tmr = gutil.GTimer(0, self._serv.controller_unresponsive, self.tid)
 
     def _release_resources(self):
-        logging.debug('Dc._release_resources()            - %s | %s', self.id, self.device)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Dc._release_resources()            - %s | %s', self.id, self.device)
         super()._release_resources()
 
         if self._ctrl_unresponsive_tmr is not None:
@@ -675,13 +696,14 @@ class Dc(Controller):
         except (TypeError, IndexError):
             dlp_supp_opts = 0
 
-        logging.debug(
-            'Dc._on_get_supported_success()     - %s | %s: supported options = 0x%04X = %s',
-            self.id,
-            self.device,
-            dlp_supp_opts,
-            dlp_supp_opts_as_string(dlp_supp_opts),
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(
+                'Dc._on_get_supported_success()     - %s | %s: supported options = 0x%04X = %s',
+                self.id,
+                self.device,
+                dlp_supp_opts,
+                dlp_supp_opts_as_string(dlp_supp_opts),
+            )
 
         if 'lsp' in inspect.signature(self._ctrl.discover).parameters:
             lsp = nvme.NVMF_LOG_DISC_LSP_PLEO if dlp_supp_opts & nvme.NVMF_LOG_DISC_LID_PLEOS else 0
@@ -805,6 +827,8 @@ class Dc(Controller):
 class Ioc(Controller):
     '''@brief This object establishes a connection to one I/O Controller.'''
 
+    __slots__ = ('_dlpe',)
+
     def __init__(self, stac, tid: trid.TID):
         self._dlpe = None
         super().__init__(tid, stac)
@@ -11,7 +11,6 @@
 import os
 import sys
 import shutil
-import platform
 from libnvme import nvme
 from staslib.version import KernelVersion
 
@@ -31,7 +30,7 @@ STACD_DBUS_PATH = '@STACD_DBUS_PATH@'
 STAFD_DBUS_NAME = '@STAFD_DBUS_NAME@'
 STAFD_DBUS_PATH = '@STAFD_DBUS_PATH@'
 
-KERNEL_VERSION = KernelVersion(platform.release())
+KERNEL_VERSION = KernelVersion(os.uname().release)
 KERNEL_IFACE_MIN_VERSION = KernelVersion('5.14')
 KERNEL_TP8013_MIN_VERSION = KernelVersion('5.16')
 KERNEL_HOSTKEY_MIN_VERSION = KernelVersion('5.20')
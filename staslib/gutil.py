@@ -10,10 +10,16 @@
 the use of certain GLib/Gio/Gobject functions/resources.
 '''
 
-import logging
+import time
+import queue
 import socket
-from gi.repository import Gio, GLib, GObject
-from staslib import conf, iputil, trid
+import logging
+import threading
+import itertools
+import functools
+import concurrent.futures
+from gi.repository import Gio, GLib
+from staslib import conf, iputil, singleton, trid
 
 
 # ******************************************************************************
@@ -24,11 +30,18 @@ class GTimer:
         self, interval_sec: float = 0, user_cback=lambda: GLib.SOURCE_REMOVE, *user_data, priority=GLib.PRIORITY_DEFAULT
     ):  # pylint: disable=keyword-arg-before-vararg
         self._source = None
-        self._interval_sec = float(interval_sec)
+        self._set_interval(interval_sec)
         self._user_cback = user_cback
         self._user_data = user_data
         self._priority = priority if priority is not None else GLib.PRIORITY_DEFAULT
 
+    def _set_interval(self, interval_sec: float):
+        '''@brief Set the interval and precompute the values needed to
+        (re)start the timer so that start() doesn't have to.'''
+        self._interval_sec = float(interval_sec)
+        self._interval_us = int(self._interval_sec * 1000000)  # micro-seconds
+        self._whole_sec = int(self._interval_sec) if self._interval_sec.is_integer() else None
+
     def _release_resources(self):
         self.stop()
         self._user_cback = None
@@ -59,17 +72,17 @@ class GTimer:
     def start(self, new_interval_sec: float = -1.0):
         '''@brief Start (or restart) timer'''
         if new_interval_sec >= 0:
-            self._interval_sec = float(new_interval_sec)
+            self._set_interval(new_interval_sec)
 
         if self._source is not None:
             self._source.set_ready_time(
-                self._source.get_time() + (self._interval_sec * 1000000)
+                self._source.get_time() + self._interval_us
             )  # ready time is in micro-seconds (monotonic time)
         else:
-            if self._interval_sec.is_integer():
-                self._source = GLib.timeout_source_new_seconds(int(self._interval_sec))  # seconds resolution
+            if self._whole_sec is not None:
+                self._source = GLib.timeout_source_new_seconds(self._whole_sec)  # seconds resolution
             else:
-                self._source = GLib.timeout_source_new(self._interval_sec * 1000.0)  # mili-seconds resolution
+                self._source = GLib.timeout_source_new(self._interval_us // 1000)  # mili-seconds resolution
 
             self._source.set_priority(self._priority)
             self._source.set_callback(self._callback)
@@ -90,7 +103,7 @@ class GTimer:
     def set_timeout(self, new_interval_sec: float):
         '''@brief set the timer's duration'''
         if new_interval_sec >= 0:
-            self._interval_sec = float(new_interval_sec)
+            self._set_interval(new_interval_sec)
 
     def get_timeout(self):
         '''@brief get the timer's duration'''
@@ -106,19 +119,274 @@ class GTimer:
         return 0
 
 
+# ******************************************************************************
+class TimerWheel(metaclass=singleton.Singleton):
+    '''@brief Timing wheel with 1-second slots. All the WheelTimer objects
+    share a single GLib timeout source (armed only while timers are
+    pending) instead of each having its own. Timers expiring during the
+    same second are grouped in the same slot.
+    '''
+
+    def __init__(self):
+        self._slots = dict()  # expiry second (monotonic) -> {timer: None} (i.e. an ordered set)
+        self._cursor = 0  # Next slot to process
+        self._source_id = None
+
+    def add(self, timer, expiry_sec: int):
+        '''@brief Add @timer to the slot of second @expiry_sec (monotonic time).
+        Timers whose expiry time has already passed are added to the next slot
+        to be processed.'''
+        if self._source_id is None:
+            # Resume from the oldest slot still pending, if any (i.e. if a
+            # previous source was lost), so that no slot gets skipped.
+            now = _monotonic_sec()
+            self._cursor = min(min(self._slots, default=now), now)
+            self._source_id = GLib.timeout_add_seconds(1, self._tick)
+        timer.wheel_slot = slot = max(expiry_sec, self._cursor)
+        timers = self._slots.get(slot)
+        if timers is None:
+            timers = self._slots[slot] = {}
+        timers[timer] = None
+
+    def remove(self, timer):
+        '''@brief The opposite of add()'''
+        slot = self._slots.get(timer.wheel_slot)
+        if slot is not None:
+            slot.pop(timer, None)
+            if not slot:
+                del self._slots[timer.wheel_slot]
+        timer.wheel_slot = None
+
+    def _tick(self):
+        completed = False
+        try:
+            now = _monotonic_sec()
+            while self._cursor <= now:
+                slot_sec = self._cursor
+                slot = self._slots.pop(slot_sec, None)
+                self._cursor += 1
+                if slot:
+                    for timer in slot:
+                        # A callback may have stopped/restarted another
+                        # timer of this slot. Skip timers that moved.
+                        if timer.wheel_slot == slot_sec:
+                            timer.wheel_slot = None
+                            try:
+                                timer._expire()  # pylint: disable=protected-access
+                            except Exception:  # pylint: disable=broad-except
+                                # One failing timer must not prevent the others from expiring
+                                logging.exception('TimerWheel._tick() - Timer callback failed')
+            completed = True
+        finally:
+            if not completed:
+                # The source goes away with the exception. Let add() arm a new one.
+                self._source_id = None
+
+        if self._slots:
+            return GLib.SOURCE_CONTINUE
+
+        self._source_id = None
+        return GLib.SOURCE_REMOVE
+
+
+def _monotonic_sec() -> int:
+    return GLib.get_monotonic_time() // 1000000
+
+
+# ******************************************************************************
+class WheelTimer:
+    '''@brief Same interface as GTimer, but the timer is scheduled on the
+    TimerWheel. The resolution is 1 second and the callback may be invoked
+    up to 1 second late. Use it for timers that exist in large numbers
+    (e.g. one per controller) and do not need sub-second accuracy.
+    '''
+
+    def __init__(
+        self, interval_sec: float = 0, user_cback=lambda: GLib.SOURCE_REMOVE, *user_data
+    ):  # pylint: disable=keyword-arg-before-vararg
+        self._interval_sec = float(interval_sec)
+        self._user_cback = user_cback
+        self._user_data = user_data
+        self._deadline_us = None  # None means that the timer is not running
+        self.wheel_slot = None  # Managed by TimerWheel
+
+    def _release_resources(self):
+        self.stop()
+        self._user_cback = None
+        self._user_data = None
+
+    def kill(self):
+        '''@brief Used to release all resources associated with a timer.'''
+        self._release_resources()
+
+    def __str__(self):
+        if self._deadline_us is not None:
+            return f'{self._interval_sec}s [{self.time_remaining()}s]'
+
+        return f'{self._interval_sec}s [off]'
+
+    def _expire(self):
+        self._deadline_us = None
+        if self._user_cback is not None and self._user_cback(*self._user_data) == GLib.SOURCE_CONTINUE:
+            self.start()
+
+    def stop(self):
+        '''@brief Stop timer'''
+        if self._deadline_us is not None:
+            TimerWheel().remove(self)
+            self._deadline_us = None
+
+    def start(self, new_interval_sec: float = -1.0):
+        '''@brief Start (or restart) timer'''
+        if new_interval_sec >= 0:
+            self._interval_sec = float(new_interval_sec)
+
+        self.stop()
+        self._deadline_us = GLib.get_monotonic_time() + int(self._interval_sec * 1000000)
+        TimerWheel().add(self, -(-self._deadline_us // 1000000))  # Round up to the next second
+
+    def clear(self):
+        '''@brief Make timer expire now. The callback function
+        will be invoked on the next tick of the timing wheel.
+        '''
+        if self._deadline_us is not None:
+            TimerWheel().remove(self)
+            self._deadline_us = 0
+            TimerWheel().add(self, 0)
+
+    def set_callback(self, user_cback, *user_data):
+        '''@brief set the callback function to invoke when timer expires'''
+        self._user_cback = user_cback
+        self._user_data = user_data
+
+    def set_timeout(self, new_interval_sec: float):
+        '''@brief set the timer's duration'''
+        if new_interval_sec >= 0:
+            self._interval_sec = float(new_interval_sec)
+
+    def get_timeout(self):
+        '''@brief get the timer's duration'''
+        return self._interval_sec
+
+    def time_remaining(self) -> float:
+        '''@brief Get how much time remains on a timer before it fires.'''
+        if self._deadline_us is not None:
+            delta_us = self._deadline_us - GLib.get_monotonic_time()
+            if delta_us > 0:
+                return delta_us / 1000000.0
+
+        return 0
+
+
+# ******************************************************************************
+class WorkerPool(metaclass=singleton.Singleton):
+    '''@brief Pool of threads used to run blocking operations (e.g. connect,
+    DNS lookups). The pool is shared by all users. Threads are created on
+    demand (up to MAX_WORKERS) and reused.
+
+    The threads are daemon threads. An operation that is stuck (e.g. connecting
+    to an unreachable controller) does not prevent the process from exiting.
+    It simply gets abandoned (see shutdown()).
+    '''
+
+    MAX_WORKERS = 32  # Operations may block for a while
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._idle = 0  # Workers waiting for work (not already promised to a submitted item)
+        self._shutdown = False
+
+    def submit(self, func, *args, **kwargs) -> concurrent.futures.Future:
+        '''@brief Run func(*args, **kwargs) in a worker thread.
+        @return A concurrent.futures.Future for the result
+        '''
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('WorkerPool: cannot run new operations after shutdown')
+
+            if self._idle:
+                self._idle -= 1
+            elif self._workers < self.MAX_WORKERS:
+                self._workers += 1
+                threading.Thread(target=self._work, name=f'stas-worker-{self._workers}', daemon=True).start()
+
+            self._queue.put((future, func, args, kwargs))
+
+        return future
+
+    def shutdown(self):
+        '''@brief Cancel the operations that have not started yet and release
+        the idle threads. Operations in progress are abandoned. The next
+        WorkerPool() call creates a new pool.'''
+        with self._lock:
+            self._shutdown = True
+            workers = self._workers
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].cancel()
+
+        for _ in range(workers):
+            self._queue.put(None)  # Tell workers to exit
+
+        WorkerPool.destroy()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            future, func, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as ex:  # pylint: disable=broad-except
+                    future.set_exception(ex)
+                else:
+                    future.set_result(result)
+
+            del item, future, func, args, kwargs  # Don't hold on to references while idle
+            with self._lock:
+                self._idle += 1
+
+
 # ******************************************************************************
 class NameResolver:  # pylint: disable=too-few-public-methods
     '''@brief DNS resolver to convert host names to IP addresses.'''
 
+    CACHE_TTL_SEC = 300  # How long a successful lookup can be reused
+
     def __init__(self):
-        self._resolver = Gio.Resolver.get_default()
+        self._cache = {}  # hostname -> (expiry time, getaddrinfo() result)
+
+    def _cached_addresses(self, hostname):
+        entry = self._cache.get(hostname)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._cache[hostname]
+            return None
+        return entry[1]
 
     def resolve_ctrl_async(self, cancellable, controllers_in: list, callback):
         '''@brief The traddr fields may specify a hostname instead of an IP
         address. We need to resolve all the host names to addresses.
         Resolving hostnames may take a while as a DNS server may need
-        to be contacted. For that reason, we're using async APIs with
-        callbacks to resolve all the hostnames.
+        to be contacted. For that reason, the hostnames are resolved
+        in parallel by worker threads (with getaddrinfo()) and the
+        results are collected in the main loop.
+
+        Successful lookups are kept for CACHE_TTL_SEC seconds, and each
+        distinct hostname is looked up only once even when several
+        controllers refer to it.
 
         The callback @callback will be called once all hostnames have
         been resolved.
@@ -127,58 +395,71 @@ class NameResolver:  # pylint: disable=too-few-public-methods
         '''
         pending_resolution_count = 0
         controllers_out = []
-        service_conf = conf.SvcConf()
+        ip_family = conf.SvcConf().ip_family
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+        def pick_addr(controllers, addresses):
+            traddr = None
+
+            # If multiple addresses are returned (which is often the case),
+            # prefer IPv4 addresses over IPv6.
+            if 4 in ip_family:
+                for family, _, _, _, sockaddr in addresses:
+                    # There may be multiple IPv4 addresses. Pick 1st one.
+                    if family == socket.AF_INET:
+                        traddr = sockaddr[0]
+                        break
+
+            if traddr is None and 6 in ip_family:
+                for family, _, _, _, sockaddr in addresses:
+                    # There may be multiple IPv6 addresses. Pick 1st one.
+                    if family == socket.AF_INET6:
+                        traddr = sockaddr[0]
+                        break
+
+            if traddr is not None:
+                for controller in controllers:
+                    if debug:
+                        logging.debug(
+                            'NameResolver.resolve_ctrl_async()  - resolved \'%s\' -> %s', controller.traddr, traddr
+                        )
+                    cid = controller.as_dict()
+                    cid['traddr'] = traddr
+                    controllers_out.append(trid.TID(cid))
 
-        def addr_resolved(resolver, result, controller):
+        def addr_resolved(future, hostname):
+            controllers = to_resolve[hostname]
             try:
-                addresses = resolver.lookup_by_name_finish(result)  # List of Gio.InetAddress objects
+                if cancellable is not None and cancellable.is_cancelled():
+                    if debug:
+                        logging.debug('NameResolver.resolve_ctrl_async()  - Operation was cancelled %s', controllers)
 
-            except GLib.GError as err:
-                # We don't need to report "cancellation" errors.
-                if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
-                    # pylint: disable=no-member
-                    logging.debug('NameResolver.resolve_ctrl_async()  - %s %s', err.message, controller)
                 else:
-                    logging.error('%s', err.message)  # pylint: disable=no-member
+                    try:
+                        addresses = future.result()  # List of (family, type, proto, canonname, sockaddr)
 
-                # if err.matches(Gio.resolver_error_quark(), Gio.ResolverError.TEMPORARY_FAILURE):
-                # elif err.matches(Gio.resolver_error_quark(), Gio.ResolverError.NOT_FOUND):
-                # elif err.matches(Gio.resolver_error_quark(), Gio.ResolverError.INTERNAL):
+                    except (OSError, UnicodeError) as err:  # UnicodeError: invalid IDNA name (e.g. "a..b")
+                        logging.error('%s: %s', hostname, err)
 
-            else:
-                traddr = None
-
-                # If multiple addresses are returned (which is often the case),
-                # prefer IPv4 addresses over IPv6.
-                if 4 in service_conf.ip_family:
-                    for address in addresses:
-                        # There may be multiple IPv4 addresses. Pick 1st one.
-                        if address.get_family() == Gio.SocketFamily.IPV4:
-                            traddr = address.to_string()
-                            break
-
-                if traddr is None and 6 in service_conf.ip_family:
-                    for address in addresses:
-                        # There may be multiple IPv6 addresses. Pick 1st one.
-                        if address.get_family() == Gio.SocketFamily.IPV6:
-                            traddr = address.to_string()
-                            break
-
-                if traddr is not None:
-                    logging.debug(
-                        'NameResolver.resolve_ctrl_async()  - resolved \'%s\' -> %s', controller.traddr, traddr
-                    )
-                    cid = controller.as_dict()
-                    cid['traddr'] = traddr
-                    nonlocal controllers_out
-                    controllers_out.append(trid.TID(cid))
+                    except Exception as err:  # pylint: disable=broad-except
+                        logging.exception('%s: Unexpected name resolution failure: %s', hostname, err)
 
-            # Invoke callback after all hostnames have been resolved
-            nonlocal pending_resolution_count
-            pending_resolution_count -= 1
-            if pending_resolution_count == 0:
-                callback(controllers_out)
+                    else:
+                        self._cache[hostname] = (time.monotonic() + self.CACHE_TTL_SEC, addresses)
+                        pick_addr(controllers, addresses)
 
+            finally:
+                # Invoke callback after all hostnames have been resolved (or
+                # have failed to resolve). This must happen no matter what or
+                # the configuration would never be applied.
+                nonlocal pending_resolution_count
+                pending_resolution_count -= 1
+                if pending_resolution_count == 0:
+                    callback(controllers_out)
+
+            return GLib.SOURCE_REMOVE
+
+        to_resolve = {}  # hostname -> [controllers]
         for controller in controllers_in:
             if controller.transport in ('tcp', 'rdma'):
                 hostname_or_addr = controller.traddr
@@ -189,10 +470,16 @@ class NameResolver:  # pylint: disable=too-few-public-methods
                     # succeeds, then we don't need to call the resolver.
                     ip = iputil.get_ipaddress_obj(hostname_or_addr)
                     if ip is None:
-                        logging.debug('NameResolver.resolve_ctrl_async()  - resolving \'%s\'', hostname_or_addr)
-                        pending_resolution_count += 1
-                        self._resolver.lookup_by_name_async(hostname_or_addr, cancellable, addr_resolved, controller)
-                    elif ip.version in service_conf.ip_family:
+                        addresses = self._cached_addresses(hostname_or_addr)
+                        if addresses is not None:
+                            pick_addr((controller,), addresses)
+                        else:
+                            if debug:
+                                logging.debug(
+                                    'NameResolver.resolve_ctrl_async()  - resolving \'%s\'', hostname_or_addr
+                                )
+                            to_resolve.setdefault(hostname_or_addr, []).append(controller)
+                    elif ip.version in ip_family:
                         controllers_out.append(controller)
                     else:
                         logging.warning(
@@ -201,22 +488,47 @@ class NameResolver:  # pylint: disable=too-few-public-methods
             else:
                 controllers_out.append(controller)
 
-        if pending_resolution_count == 0:  # No names are pending asynchronous resolution
+        if not to_resolve:  # No names are pending asynchronous resolution
             callback(controllers_out)
+            return
+
+        # Count all the lookups before submitting any of them so
+        # that @callback cannot be invoked before the last one.
+        pending_resolution_count = len(to_resolve)
+        pool = WorkerPool()
+        for hostname in to_resolve:
+            future = pool.submit(socket.getaddrinfo, hostname, None, type=socket.SOCK_STREAM)
+            future.add_done_callback(functools.partial(_idle_add_done_callback, addr_resolved, hostname))
+
+
+def _idle_add_done_callback(func, user_data, future):
+    '''@brief Future done-callback (called from a worker thread) used to
+    hand the result back to @func in the main loop'''
+    GLib.idle_add(func, future, user_data)
 
 
 # ******************************************************************************
-class _TaskRunner(GObject.Object):
-    '''@brief This class allows running methods asynchronously in a thread.'''
+class _TaskRunner:
+    '''@brief This class allows running methods asynchronously in a thread.
+    The threads are taken from a pool shared by all runners (i.e. threads are
+    reused instead of being spawned for each operation). Completion is
+    reported back to the main loop with GLib.idle_add().
+    '''
+
+    __slots__ = ('_user_function', '_user_args')
 
     def __init__(self, user_function, *user_args):
         '''@param user_function: function to run inside a thread
         @param user_args: arguments passed to @user_function
         '''
-        super().__init__()
         self._user_function = user_function
         self._user_args = user_args
 
+    def _in_thread_exec(self, cancellable):
+        if cancellable is not None and cancellable.is_cancelled():
+            return None  # Bail out if task has been cancelled
+        return self._user_function(*self._user_args)
+
     def communicate(self, cancellable, cb_function, *cb_args):
         '''@param cancellable: A Gio.Cancellable object that can be used to
                             cancel an in-flight async command.
@@ -228,27 +540,20 @@ class _TaskRunner(GObject.Object):
 
                             Where:
                                 runner: This _TaskRunner object instance
-                                result: A GObject.Object instance that contains the result
+                                result: An opaque object to pass to communicate_finish()
                                 cb_args: The cb_args arguments passed to communicate()
 
         @param cb_args: User arguments to pass to @cb_function
+        @return A concurrent.futures.Future object
         '''
+        future = WorkerPool().submit(self._in_thread_exec, cancellable)
+        future.add_done_callback(functools.partial(self._on_done, cancellable, cb_function, cb_args))
+        return future
 
-        def in_thread_exec(task, self, task_data, cancellable):  # pylint: disable=unused-argument
-            if task.return_error_if_cancelled():
-                return  # Bail out if task has been cancelled
-
-            try:
-                value = GObject.Object()
-                value.result = self._user_function(*self._user_args)
-                task.return_value(value)
-            except Exception as ex:  # pylint: disable=broad-except
-                task.return_error(GLib.Error(message=str(ex), domain=type(ex).__name__))
-
-        task = Gio.Task.new(self, cancellable, cb_function, *cb_args)
-        task.set_return_on_cancel(False)
-        task.run_in_thread(in_thread_exec)
-        return task
+    def _on_done(self, cancellable, cb_function, cb_args, future):
+        '''@brief Future done-callback (called from a worker thread) used to
+        hand the result back to @cb_function in the main loop'''
+        GLib.idle_add(cb_function, self, (future, cancellable), *cb_args)
 
     def communicate_finish(self, result):
         '''@brief Use this function in your callback (see @cb_function) to
@@ -257,11 +562,18 @@ class _TaskRunner(GObject.Object):
         @return On success (True, data, None),
         On failure (False, None, err: GLib.Error)
         '''
+        future, cancellable = result
+        if cancellable is not None and cancellable.is_cancelled():
+            return (
+                False,
+                None,
+                GLib.Error.new_literal(Gio.io_error_quark(), 'Operation was cancelled', Gio.IOErrorEnum.CANCELLED),
+            )
+
         try:
-            success, value = result.propagate_value()
-            return success, value.result, None
-        except GLib.Error as err:
-            return False, None, err
+            return True, future.result(), None
+        except Exception as ex:  # pylint: disable=broad-except
+            return False, None, GLib.Error(message=str(ex), domain=type(ex).__name__)
 
 
 # ******************************************************************************
@@ -270,6 +582,20 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
     can be cancelled or retried.
     '''
 
+    __slots__ = (
+        '_cancellable',
+        '_dead',
+        '_operation',
+        '_op_args',
+        '_runner',
+        '_success_cb',
+        '_fail_cb',
+        '_retry_tmr',
+        '_errmsg',
+        '_task',
+        '_fail_cnt',
+    )
+
     def __init__(self, on_success_callback, on_failure_callback, operation, *op_args):
         '''@param on_success_callback: Callback method invoked when @operation completes successfully
         @param on_failure_callback: Callback method invoked when @operation fails
@@ -277,8 +603,10 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
         @param op_args: Arguments passed to operation
         '''
         self._cancellable = Gio.Cancellable()
+        self._dead = False  # Mirrors self._cancellable without a GObject call
         self._operation = operation
         self._op_args = op_args
+        self._runner = _TaskRunner(operation, *op_args)  # Reused for retries
         self._success_cb = on_success_callback
         self._fail_cb = on_failure_callback
         self._retry_tmr = None
@@ -288,6 +616,7 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
 
     def _release_resources(self):
         if self._alive():
+            self._dead = True
             self._cancellable.cancel()
 
         if self._retry_tmr is not None:
@@ -295,6 +624,7 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
 
         self._operation = None
         self._op_args = None
+        self._runner = None
         self._success_cb = None
         self._fail_cb = None
         self._retry_tmr = None
@@ -308,30 +638,34 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
 
     def as_dict(self):
         '''Return object members as a dictionary'''
+        # Built on demand: 'completed', 'alive' and the retry timer's
+        # remaining time change on their own, so a cached copy would go stale.
+        task = self._task
         info = {
             'fail count': self._fail_cnt,
-            'completed': self._task.get_completed() if self._task else None,
-            'alive': self._alive(),
+            'completed': task.done() if task is not None else None,
+            'alive': not self._dead,
         }
 
-        if self._retry_tmr:
+        if self._retry_tmr is not None:
             info['retry timer'] = str(self._retry_tmr)
 
         if self._errmsg:
-            info['error'] = self._errmsg
+            info['error'] = str(self._errmsg)
 
         return info
 
     def _alive(self):
-        return self._cancellable and not self._cancellable.is_cancelled()
+        return not self._dead
 
     def completed(self):
         '''@brief Returns True if the task has completed, False otherwise.'''
-        return self._task is not None and self._task.get_completed()
+        return self._task is not None and self._task.done()
 
     def cancel(self):
         '''@brief cancel async operation'''
         if self._alive():
+            self._dead = True
             self._cancellable.cancel()
 
     def kill(self):
@@ -344,16 +678,16 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
         Controller. When the operation completes (or fails) the
         callback method @_on_operation_complete() will be invoked.
         '''
-        runner = _TaskRunner(self._operation, *self._op_args)
-        self._task = runner.communicate(self._cancellable, self._on_operation_complete, *args)
+        self._task = self._runner.communicate(self._cancellable, self._on_operation_complete, *args)
 
     def retry(self, interval_sec, *args):
         '''@brief Tell this object that the async operation is to be retried
-        in @interval_sec seconds.
-
+        in @interval_sec seconds. Retry timers live on the shared TimerWheel
+        so that many operations retrying at once do not each add a GLib
+        timeout source to the main loop.
         '''
         if self._retry_tmr is None:
-            self._retry_tmr = GTimer()
+            self._retry_tmr = WheelTimer()
         self._retry_tmr.set_callback(self._on_retry_timeout, *args)
         self._retry_tmr.start(interval_sec)
 
@@ -374,8 +708,8 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
         This callback method is invoked when the operation with the
         Controller has completed (be it successful or not).
         '''
-        # The operation might have been cancelled.
-        # Only proceed if it hasn't been cancelled.
+        # The operation might have been cancelled. Only proceed if it
+        # hasn't been cancelled. Check this before looking at the result.
         if self._operation is None or not self._alive():
             return
 
@@ -386,37 +720,96 @@ class AsyncTask:  # pylint: disable=too-many-instance-attributes
             self._fail_cnt = 0
             self._success_cb(self, data, *args)
         else:
-            self._errmsg = str(err)
+            self._errmsg = err  # Converted to a string only when needed (see as_dict())
             self._fail_cnt += 1
             self._fail_cb(self, err, self._fail_cnt, *args)
 
 
+# ******************************************************************************
+class _DeferredBatch(metaclass=singleton.Singleton):
+    '''@brief Run all the scheduled Deferred objects from a single idle
+    source instead of adding one idle source per Deferred to the main loop.
+    At most MAX_PER_TICK Deferred objects run per main loop iteration so that
+    a large batch (e.g. hundreds of controllers created at once) does not
+    starve the other event sources.
+    '''
+
+    MAX_PER_TICK = 16
+
+    def __init__(self):
+        self._pending = dict()  # Deferred -> None (i.e. an ordered set)
+        self._source_id = None
+
+    def add(self, deferred):
+        '''@brief Add @deferred to the next batch'''
+        self._pending[deferred] = None
+        if self._source_id is None:
+            self._source_id = GLib.idle_add(self._drain)
+
+    def remove(self, deferred):
+        '''@brief The opposite of add()'''
+        self._pending.pop(deferred, None)
+
+    def _drain(self):
+        # Forget the source before dispatching. Should something escape
+        # anyway, add() will arm a new source instead of relying on this one.
+        source_id, self._source_id = self._source_id, None
+
+        pending = self._pending
+        batch = list(itertools.islice(pending, self.MAX_PER_TICK))
+        for deferred in batch:
+            del pending[deferred]
+        for deferred in batch:
+            try:
+                deferred._run()  # pylint: disable=protected-access
+            except Exception:  # pylint: disable=broad-except
+                # One failing call must not prevent the others from running
+                logging.exception('_DeferredBatch._drain() - Deferred call failed')
+
+        # Keep this source if there's more to do (including Deferred objects
+        # (re)scheduled by this batch), unless add() already armed a new one.
+        if pending and self._source_id is None:
+            self._source_id = source_id
+            return GLib.SOURCE_CONTINUE
+
+        return GLib.SOURCE_REMOVE
+
+
 # ******************************************************************************
 class Deferred:
     '''Implement a deferred function call. A deferred is a function that gets
-    added to the main loop to be executed during the next idle slot.'''
+    added to the main loop to be executed during the next idle slot. All the
+    deferred function calls scheduled in the meantime run in the same idle slot.'''
 
     def __init__(self, func, *user_data):
-        self._source = None
+        self._scheduled = False
         self._func = func
         self._user_data = user_data
 
     def schedule(self):
         '''Schedule the function to be called by the main loop. If the
         function  is already scheduled, then do nothing'''
-        if not self.is_scheduled():
-            srce_id = GLib.idle_add(self._func, *self._user_data)
-            self._source = GLib.main_context_default().find_source_by_id(srce_id)
+        if not self._scheduled:
+            self._scheduled = True
+            _DeferredBatch().add(self)
 
     def is_scheduled(self):
         '''Check if deferred is currently schedules to run'''
-        return self._source and not self._source.is_destroyed()
+        return self._scheduled
 
     def cancel(self):
         '''Remove deferred from main loop'''
-        if self.is_scheduled():
-            self._source.destroy()
-        self._source = None
+        if self._scheduled:
+            _DeferredBatch().remove(self)
+        self._scheduled = False
+
+    def _run(self):
+        if not self._scheduled:
+            return  # Cancelled while its batch was running
+
+        self._scheduled = False
+        if self._func(*self._user_data) == GLib.SOURCE_CONTINUE:
+            self.schedule()
 
 
 # ******************************************************************************
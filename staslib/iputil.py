@@ -10,6 +10,7 @@
 
 import struct
 import socket
+import functools
 import ipaddress
 
 RTM_BASE = 16
@@ -150,6 +151,17 @@ def ip_equal(ip1, ip2):
 
 
 # ******************************************************************************
+@functools.lru_cache(maxsize=1024)
+def _parse_ip(ipaddr):
+    '''@brief Memoized ipaddress.ip_address(). The same addresses (TIDs,
+    udev attributes) get parsed over and over. The address objects are
+    immutable and can therefore be shared.'''
+    try:
+        return ipaddress.ip_address(ipaddr)
+    except ValueError:
+        return None
+
+
 def get_ipaddress_obj(ipaddr, ipv4_mapped_convert=False):
     '''@brief Return a IPv4Address or IPv6Address depending on whether @ipaddr
     is a valid IPv4 or IPv6 address. Return None otherwise.
@@ -157,9 +169,8 @@ def get_ipaddress_obj(ipaddr, ipv4_mapped_convert=False):
     If ipv4_mapped_resolve is set to True, IPv6 addresses that are IPv4-Mapped,
     will be converted to their IPv4 equivalent.
     '''
-    try:
-        ip = ipaddress.ip_address(ipaddr)
-    except ValueError:
+    ip = _parse_ip(ipaddr)
+    if ip is None:
         return None
 
     if ipv4_mapped_convert:
@@ -170,6 +181,29 @@ def get_ipaddress_obj(ipaddr, ipv4_mapped_convert=False):
     return ip
 
 
+# ******************************************************************************
+@functools.lru_cache(maxsize=1024)
+def ip_version(ipaddr):
+    '''@brief Return the IP version (4 or 6) of @ipaddr, or None if @ipaddr is
+    not a valid IPv4 or IPv6 address. The same addresses get checked over and
+    over (e.g. on every Discovery Log Page refresh), hence the cache.
+    '''
+    # socket.inet_pton() (C) is much faster than the ipaddress module and
+    # accepts the same address formats, except for IPv6 scope IDs (e.g.
+    # "fe80::1%eth0"). The ipaddress module is used as a fallback for those.
+    try:
+        if ':' in ipaddr:
+            socket.inet_pton(socket.AF_INET6, ipaddr)
+            return 6
+        socket.inet_pton(socket.AF_INET, ipaddr)
+        return 4
+    except (OSError, TypeError):
+        pass
+
+    ip = get_ipaddress_obj(ipaddr)
+    return None if ip is None else ip.version
+
+
 # ******************************************************************************
 def net_if_addrs():  # pylint: disable=too-many-locals
     '''@brief Return a dictionary listing every IP addresses for each interface.
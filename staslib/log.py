@@ -9,10 +9,29 @@
 '''nvme-stas logging module'''
 
 import sys
+import queue
+import atexit
 import logging
+import logging.handlers
 from staslib import defs
 
 
+def _queued(handler):
+    '''@brief Return a QueueHandler that hands records over to @handler
+    from a background thread. This way, the main loop never blocks on
+    the journal/syslog socket. The listener (i.e. the thread) is
+    available as the "listener" attribute of the returned handler.
+    '''
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Flush pending records on exit
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = listener
+    return queue_handler
+
+
 def init(syslog: bool):
     '''Init log module
     @param syslog: True to send messages to the syslog,
@@ -33,6 +52,8 @@ def init(syslog: bool):
 
             handler = SysLogHandler(address="/dev/log")
             handler.setFormatter(logging.Formatter(f'{defs.PROG_NAME}: %(message)s'))
+
+        handler = _queued(handler)
     else:
         # Log to stdout
         handler = logging.StreamHandler(stream=sys.stdout)
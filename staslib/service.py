@@ -141,7 +141,7 @@ class CtrlTerminator:
         # that have no pending operations, and remove those controllers from the
         # list (only keep controllers that still have operations pending).
         self._controllers[:] = filterfalse(self._keep_or_terminate, self._controllers)
-        disposal_complete = len(self._controllers) == 0
+        disposal_complete = not self._controllers
 
         if disposal_complete:
             logging.debug('CtrlTerminator._disposal_check()   - Disposal complete')
@@ -177,7 +177,7 @@ class Service(stas.ServiceABC):
     def _disconnect_all(self):
         '''Tell all controller objects to disconnect'''
         keep_connections = self._keep_connections_on_exit()
-        controllers = self._controllers.values()
+        controllers = list(self._controllers.values())  # Snapshot. Controllers get removed as they disconnect.
         logging.debug(
             'Service._stop_hdlr()               - Controller count = %s, keep_connections = %s',
             len(controllers),
@@ -264,7 +264,7 @@ class Stac(Service):
         self._add_event_soak_tmr = None
 
     def _dump_last_known_config(self, controllers):
-        config = list(controllers.keys())
+        config = [tid.as_dict() for tid in controllers]
         logging.debug('Stac._dump_last_known_config()     - IOC count = %s', len(config))
         self._write_lkc(config)
 
@@ -273,11 +273,12 @@ class Stac(Service):
         logging.debug('Stac._load_last_known_config()     - IOC count = %s', len(config))
 
         controllers = {}
-        for tid in config:
-            # Only create Ioc objects if there is already a connection in the kernel
-            # First, regenerate the TID (in case of soft. upgrade and TID object
-            # has changed internally)
-            tid = trid.TID(tid.as_dict())
+        for cid in config:
+            # Only create Ioc objects if there is already a connection in the kernel.
+            # Configs saved by older versions contain TID objects instead of
+            # dictionaries. Regenerate those TIDs (in case of soft. upgrade and
+            # TID object has changed internally).
+            tid = trid.TID(cid if isinstance(cid, dict) else cid.as_dict())
             if udev.UDEV.find_nvme_ioc_device(tid) is not None:
                 controllers[tid] = ctrl.Ioc(self, tid)
 
@@ -389,7 +390,7 @@ class Stac(Service):
 
         logging.debug('Stac._config_ctrls_finish()        - configured_ctrl_list = %s', configured_ctrl_list)
 
-        discovered_ctrls = dict()
+        discovered_ctrls = {}
         for staf_data in self._get_log_pages_from_stafd():
             host_traddr = staf_data['discovery-controller']['host-traddr']
             host_iface = staf_data['discovery-controller']['host-iface']
@@ -402,16 +403,16 @@ class Stac(Service):
         discovered_ctrl_list = list(discovered_ctrls.keys())
         logging.debug('Stac._config_ctrls_finish()        - discovered_ctrl_list = %s', discovered_ctrl_list)
 
-        controllers = stas.remove_excluded(configured_ctrl_list + discovered_ctrl_list)
-        controllers = stas.remove_invalid_addresses(controllers)
+        controllers = stas.filter_controllers(configured_ctrl_list + discovered_ctrl_list)
 
         new_controller_tids = set(controllers)
         cur_controller_tids = set(self._controllers.keys())
         controllers_to_add = new_controller_tids - cur_controller_tids
         controllers_to_del = cur_controller_tids - new_controller_tids
 
-        logging.debug('Stac._config_ctrls_finish()        - controllers_to_add   = %s', list(controllers_to_add))
-        logging.debug('Stac._config_ctrls_finish()        - controllers_to_del   = %s', list(controllers_to_del))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Stac._config_ctrls_finish()        - controllers_to_add   = %s', list(controllers_to_add))
+            logging.debug('Stac._config_ctrls_finish()        - controllers_to_del   = %s', list(controllers_to_del))
 
         svc_conf = conf.SvcConf()
         no_disconnect = svc_conf.disconnect_scope == 'no-disconnect'
@@ -428,8 +429,8 @@ class Stac(Service):
                 keep_connection = no_disconnect or (match_trtypes and tid.transport not in svc_conf.disconnect_trtypes)
                 self._terminator.dispose(controller, self.remove_controller, keep_connection)
 
-        for tid in controllers_to_add:
-            self._controllers[tid] = ctrl.Ioc(self, tid)
+        # Single bulk insert. The dict is resized at most once.
+        self._controllers.update({tid: ctrl.Ioc(self, tid) for tid in controllers_to_add})
 
         for tid, controller in self._controllers.items():
             if tid in discovered_ctrls:
@@ -626,27 +627,29 @@ class Staf(Service):
             self._avahi = None
 
     def _dump_last_known_config(self, controllers):
-        config = {tid: {'log_pages': dc.log_pages(), 'origin': dc.origin} for tid, dc in controllers.items()}
+        config = [
+            {'tid': tid.as_dict(), 'log_pages': dc.log_pages(), 'origin': dc.origin} for tid, dc in controllers.items()
+        ]
         logging.debug('Staf._dump_last_known_config()     - DC count = %s', len(config))
         self._write_lkc(config)
 
     def _load_last_known_config(self):
-        config = self._read_lkc() or dict()
+        config = self._read_lkc() or list()
         logging.debug('Staf._load_last_known_config()     - DC count = %s', len(config))
 
-        controllers = {}
-        for tid, data in config.items():
-            if isinstance(data, dict):
-                log_pages = data.get('log_pages')
-                origin = data.get('origin')
-            else:
-                log_pages = data
-                origin = None
+        if isinstance(config, dict):
+            # Configs saved by older versions map TID objects to either the
+            # log pages or a dictionary. Regenerate those TIDs (in case of
+            # soft. upgrade and TID object has changed internally).
+            config = [
+                {'tid': tid.as_dict(), **(data if isinstance(data, dict) else {'log_pages': data})}
+                for tid, data in config.items()
+            ]
 
-            # Regenerate the TID (in case of soft. upgrade and TID object
-            # has changed internally)
-            tid = trid.TID(tid.as_dict())
-            controllers[tid] = ctrl.Dc(self, tid, log_pages, origin)
+        controllers = {}
+        for entry in config:
+            tid = trid.TID(entry['tid'])
+            controllers[tid] = ctrl.Dc(self, tid, entry.get('log_pages'), entry.get('origin'))
 
         return controllers
 
@@ -759,8 +762,7 @@ class Staf(Service):
         logging.debug('Staf._config_ctrls_finish()        - referral_ctrl_list   = %s', referral_ctrl_list)
 
         all_ctrls = configured_ctrl_list + discovered_ctrl_list + referral_ctrl_list
-        controllers = stas.remove_excluded(all_ctrls)
-        controllers = stas.remove_invalid_addresses(controllers)
+        controllers = stas.filter_controllers(all_ctrls)
 
         new_controller_tids = set(controllers)
         cur_controller_tids = set(self._controllers.keys())
@@ -781,15 +783,17 @@ class Staf(Service):
         # temporary mDNS impairments. Removal of Avahi-discovered DCs will be
         # handled differently and only if the connection cannot be established
         # for a long period of time.
-        logging.debug('Staf._config_ctrls_finish()        - must_remove_list     = %s', list(must_remove_list))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Staf._config_ctrls_finish()        - must_remove_list     = %s', list(must_remove_list))
         controllers_to_del = {
             tid
             for tid in controllers_to_del
             if tid in must_remove_list or self._controllers[tid].origin != 'discovered'
         }
 
-        logging.debug('Staf._config_ctrls_finish()        - controllers_to_add   = %s', list(controllers_to_add))
-        logging.debug('Staf._config_ctrls_finish()        - controllers_to_del   = %s', list(controllers_to_del))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Staf._config_ctrls_finish()        - controllers_to_add   = %s', list(controllers_to_add))
+            logging.debug('Staf._config_ctrls_finish()        - controllers_to_del   = %s', list(controllers_to_del))
 
         # Delete controllers
         for tid in controllers_to_del:
@@ -801,8 +805,7 @@ class Staf(Service):
             self.dc_removed()  # Let other apps (e.g. stacd) know that discovery controllers were removed.
 
         # Add controllers
-        for tid in controllers_to_add:
-            self._controllers[tid] = ctrl.Dc(self, tid)
+        self._controllers.update({tid: ctrl.Dc(self, tid) for tid in controllers_to_add})
 
         # Update "origin" on all DC objects
         for tid, controller in self._controllers.items():
@@ -15,12 +15,15 @@ class Singleton(type):
     _instances = {}
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
+        # Single dict lookup on the fast path (i.e. the instance exists). Some
+        # singletons (e.g. SvcConf) get "instantiated" very frequently.
+        instance = cls._instances.get(cls)
+        if instance is None:
             # This variable declaration is required to force a
             # strong reference on the instance.
             instance = super(Singleton, cls).__call__(*args, **kwargs)
             cls._instances[cls] = instance
-        return cls._instances[cls]
+        return instance
 
     def destroy(cls):
         '''Delete a singleton instance.
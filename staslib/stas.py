@@ -12,9 +12,12 @@ including the Abstract Base Classes (ABC) for Controllers and Services'''
 import os
 import sys
 import abc
+import stat
+import json
 import signal
 import pickle
 import logging
+import operator
 import dasbus.connection
 from gi.repository import Gio, GLib
 from systemd.daemon import notify as sd_notify
@@ -81,103 +84,191 @@ def check_if_allowed_to_continue():
         sys.exit(f'Permission denied. You need root privileges to run {defs.PROG_NAME}.')
 
     # 2) Check that nvme-tcp kernel module is running
-    if not os.path.exists('/dev/nvme-fabrics'):
+    try:
+        mode = os.stat('/dev/nvme-fabrics').st_mode
+    except OSError:
         # There's no point going any further if the kernel module hasn't been loaded
         sys.exit('Fatal error: missing nvme-tcp kernel module')
 
+    if not stat.S_ISCHR(mode):
+        sys.exit('Fatal error: /dev/nvme-fabrics is not a character device')
+
 
 # ******************************************************************************
-def remove_invalid_addresses(controllers: list):
-    '''@brief Remove controllers with invalid addresses from the list of controllers.
-    @param controllers: List of TIDs
+def _has_valid_address(controller, service_conf, ip_family) -> bool:
+    '''@brief Check whether @controller has a valid address (see filter_controllers()).
+    @param service_conf: conf.SvcConf() (passed in to avoid looking it up for each controller)
+    @param ip_family: service_conf.ip_family
     '''
-    service_conf = conf.SvcConf()
-    valid_controllers = list()
-    for controller in controllers:
-        if controller.transport in ('tcp', 'rdma'):
-            # Let's make sure that traddr is
-            # syntactically a valid IPv4 or IPv6 address.
-            ip = iputil.get_ipaddress_obj(controller.traddr)
-            if ip is None:
-                logging.warning('%s IP address is not valid', controller)
-                continue
-
-            # Let's make sure the address family is enabled.
-            if ip.version not in service_conf.ip_family:
+    if controller.transport in ('tcp', 'rdma'):
+        # Let's make sure that traddr is
+        # syntactically a valid IPv4 or IPv6 address.
+        version = iputil.ip_version(controller.traddr)
+        if version is None:
+            logging.warning('%s IP address is not valid', controller)
+            return False
+
+        # Let's make sure the address family is enabled.
+        if version not in ip_family:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
                 logging.debug(
                     '%s ignored because IPv%s is disabled in %s',
                     controller,
-                    ip.version,
+                    version,
                     service_conf.conf_file,
                 )
-                continue
+            return False
 
-            valid_controllers.append(controller)
-
-        elif controller.transport in ('fc', 'loop'):
-            # At some point, need to validate FC addresses as well...
-            valid_controllers.append(controller)
+        return True
 
-        else:
-            logging.warning('Invalid transport %s', controller.transport)
+    if controller.transport in ('fc', 'loop'):
+        # At some point, need to validate FC addresses as well...
+        return True
 
-    return valid_controllers
+    logging.warning('Invalid transport %s', controller.transport)
+    return False
 
 
 # ******************************************************************************
 def tid_from_dlpe(dlpe, host_traddr, host_iface, host_nqn):
-    '''@brief Take a Discovery Log Page Entry and return a Controller ID as a dict.'''
-    cid = {
-        'transport': dlpe['trtype'],
-        'traddr': dlpe['traddr'],
-        'trsvcid': dlpe['trsvcid'],
-        'host-traddr': host_traddr,
-        'host-iface': host_iface,
-        'subsysnqn': dlpe['subnqn'],
-    }
-    if host_nqn:
-        cid['host-nqn'] = host_nqn
-    return trid.TID(cid)
+    '''@brief Take a Discovery Log Page Entry and return a Transport ID.'''
+    return trid.TID.from_values(
+        dlpe['trtype'],
+        dlpe['traddr'],
+        dlpe['trsvcid'],
+        dlpe['subnqn'],
+        host_traddr,
+        host_iface,
+        host_nqn or None,
+    )
 
 
 # ******************************************************************************
-def _excluded(excluded_ctrl_list, controller: dict):
-    '''@brief Check if @controller is excluded.'''
+def _no_keys(_controller):
+    return ()
+
+
+def _exclusion_index(excluded_ctrl_list):
+    '''@brief Group the exclusion entries by the keys they specify.
+    @param excluded_ctrl_list: List of dictionaries (see SvcConf.get_excluded())
+    @return List of (getter, values) pairs, one per distinct set of keys.
+            getter is an operator.itemgetter() for those keys and values is
+            the set of what getter returns for each entry that specifies
+            exactly those keys.
+    '''
+    groups = {}
     for excluded_ctrl in excluded_ctrl_list:
-        test_results = [val == controller.get(key, None) for key, val in excluded_ctrl.items()]
-        if all(test_results):
-            return True
+        keys = tuple(sorted(excluded_ctrl))
+        groups.setdefault(keys, set()).add(tuple(excluded_ctrl[key] for key in keys))
+
+    index = []
+    for keys, values in groups.items():
+        if not keys:  # An empty entry matches every controller
+            index.append((_no_keys, values))
+        elif len(keys) == 1:  # itemgetter() returns a scalar, not a tuple
+            index.append((operator.itemgetter(*keys), {value for value, in values}))
+        else:
+            index.append((operator.itemgetter(*keys), values))
+    return index
+
+
+def _excluded(exclusion_index, controller: dict):
+    '''@brief Check if @controller is excluded, i.e. whether it matches all
+    the key/value pairs of at least one exclusion entry.
+    @param exclusion_index: As returned by _exclusion_index()
+    '''
+    for getter, values in exclusion_index:
+        try:
+            if getter(controller) in values:
+                return True
+        except KeyError:  # @controller does not have one of the keys. No match.
+            pass
     return False
 
 
+_EXCLUSION_INDEX_CACHE = {}  # {config signature: (excluded_ctrl_list, exclusion index)}. A single entry.
+
+
+def _get_exclusion_index(service_conf):
+    '''@brief Return the exclusion index (see _exclusion_index()) for the
+    current configuration, or None when no controllers are excluded.
+    The index is rebuilt only when the configuration file gets parsed
+    with different contents (see SvcConf.conf_signature).'''
+    signature = service_conf.conf_signature
+    entry = _EXCLUSION_INDEX_CACHE.get(signature)
+    if entry is None:
+        excluded_ctrl_list = service_conf.get_excluded()
+        entry = (excluded_ctrl_list, _exclusion_index(excluded_ctrl_list) if excluded_ctrl_list else None)
+        _EXCLUSION_INDEX_CACHE.clear()
+        _EXCLUSION_INDEX_CACHE[signature] = entry
+
+    excluded_ctrl_list, exclusion_index = entry
+    if excluded_ctrl_list and logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug('_get_exclusion_index()             - excluded_ctrl_list   = %s', excluded_ctrl_list)
+
+    return exclusion_index
+
+
 # ******************************************************************************
 def remove_excluded(controllers: list):
     '''@brief Remove excluded controllers from the list of controllers.
     @param controllers: List of TIDs
     '''
-    excluded_ctrl_list = conf.SvcConf().get_excluded()
-    if excluded_ctrl_list:
-        logging.debug('remove_excluded()                  - excluded_ctrl_list   = %s', excluded_ctrl_list)
+    exclusion_index = _get_exclusion_index(conf.SvcConf())
+    if exclusion_index is not None:
         controllers = [
-            controller for controller in controllers if not _excluded(excluded_ctrl_list, controller.as_dict())
+            controller for controller in controllers if not _excluded(exclusion_index, controller.as_dict())
         ]
     return controllers
 
 
+# ******************************************************************************
+def filter_controllers(controllers):
+    '''@brief Remove excluded controllers and controllers with invalid
+    addresses in a single pass.
+    @param controllers: Iterable of TIDs
+    @return List of TIDs
+    '''
+    service_conf = conf.SvcConf()
+    ip_family = service_conf.ip_family
+    exclusion_index = _get_exclusion_index(service_conf)
+    if exclusion_index is None:
+        return [controller for controller in controllers if _has_valid_address(controller, service_conf, ip_family)]
+
+    return [
+        controller
+        for controller in controllers
+        if not _excluded(exclusion_index, controller.as_dict())
+        and _has_valid_address(controller, service_conf, ip_family)
+    ]
+
+
 # ******************************************************************************
 class ControllerABC(abc.ABC):
     '''@brief Base class used to manage the connection to a controller.'''
 
+    __slots__ = (
+        '_tid',
+        '_cid',
+        '_serv',
+        '_dead',
+        '_connect_attempts',
+        '_retry_connect_tmr',
+        '_discovery_ctrl',
+        '_try_to_connect_deferred',
+    )
+
     CONNECT_RETRY_PERIOD_SEC = 60
     FAST_CONNECT_RETRY_PERIOD_SEC = 3
 
     def __init__(self, tid: trid.TID, service, discovery_ctrl: bool = False):
         self._tid = tid
+        self._cid = None  # controller_id_dict() cache. The TID never changes.
         self._serv = service  # Refers to the parent service (either Staf or Stac)
         self.set_level_from_tron(self._serv.tron)
-        self._cancellable = Gio.Cancellable()
+        self._dead = False
         self._connect_attempts = 0
-        self._retry_connect_tmr = gutil.GTimer(self.CONNECT_RETRY_PERIOD_SEC, self._on_try_to_connect)
+        self._retry_connect_tmr = gutil.WheelTimer(self.CONNECT_RETRY_PERIOD_SEC, self._on_try_to_connect)
         self._discovery_ctrl = discovery_ctrl
         self._try_to_connect_deferred = gutil.Deferred(self._try_to_connect)
         self._try_to_connect_deferred.schedule()
@@ -190,12 +281,9 @@ class ControllerABC(abc.ABC):
         if self._retry_connect_tmr is not None:
             self._retry_connect_tmr.kill()
 
-        if self._alive():
-            self._cancellable.cancel()
-
+        self._dead = True
         self._tid = None
         self._serv = None
-        self._cancellable = None
         self._retry_connect_tmr = None
         self._try_to_connect_deferred = None
 
@@ -211,7 +299,9 @@ class ControllerABC(abc.ABC):
 
     def controller_id_dict(self) -> dict:
         '''@brief return the controller ID as a dict.'''
-        return {k: str(v) for k, v in self.tid.as_dict().items()}
+        if self._cid is None:
+            self._cid = {k: str(v) for k, v in self.tid.as_dict().items()}
+        return self._cid.copy()
 
     def details(self) -> dict:
         '''@brief return detailed debug info about this controller'''
@@ -228,7 +318,7 @@ class ControllerABC(abc.ABC):
         '''@brief Used to cancel pending operations.'''
         if self._alive():
             logging.debug('ControllerABC.cancel()             - %s', self.id)
-            self._cancellable.cancel()
+            self._dead = True
 
     def kill(self):
         '''@brief Used to release all resources associated with this object.'''
@@ -241,7 +331,7 @@ class ControllerABC(abc.ABC):
         can be used by callback functions to make sure the object is still
         alive before processing further.
         '''
-        return self._cancellable and not self._cancellable.is_cancelled()
+        return not self._dead
 
     def _on_try_to_connect(self):
         if self._alive():
@@ -252,15 +342,12 @@ class ControllerABC(abc.ABC):
         return True
 
     def _try_to_connect(self):
+        # This is a deferred function call. Cancelling the deferred
+        # (see _release_resources()) guarantees that we don't get here
+        # after the object is killed.
         if not self._alive():
             return GLib.SOURCE_REMOVE
 
-        # This is a deferred function call. Make sure
-        # the source of the deferred is still good.
-        source = GLib.main_current_source()
-        if source and source.is_destroyed():
-            return GLib.SOURCE_REMOVE
-
         self._connect_attempts += 1
 
         self._do_connect()
@@ -328,10 +415,12 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         log.set_level_from_tron(self._tron)
 
         self._lkc_file = os.path.join(
-            os.environ.get('RUNTIME_DIRECTORY', os.path.join('/run', defs.PROG_NAME)), 'last-known-config.pickle'
+            os.environ.get('RUNTIME_DIRECTORY', os.path.join('/run', defs.PROG_NAME)), 'last-known-config.json'
         )
         self._loop = GLib.MainLoop()
         self._cancellable = Gio.Cancellable()
+        self._dead = False  # Mirrors self._cancellable without a GObject call
+        self._exit_scheduled = False
         self._resolver = gutil.NameResolver()
         self._controllers = self._load_last_known_config()
         self._dbus_iface = None
@@ -360,6 +449,7 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         logging.debug('ServiceABC._release_resources()')
 
         if self._alive():
+            self._dead = True
             self._cancellable.cancel()
 
         if self._cfg_soak_tmr is not None:
@@ -413,8 +503,10 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         info['kernel support.host_iface'] = str(nvme_options.host_iface_supp)
         return info
 
-    def get_controllers(self) -> dict:
-        '''@brief return the list of controller objects'''
+    def get_controllers(self):
+        '''@brief return the controller objects. This is a live view (no
+        copy is made). Callers that may add or remove controllers while
+        iterating must take a snapshot first (e.g. list()).'''
         return self._controllers.values()
 
     def get_controller(
@@ -428,16 +520,9 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         host_nqn: str,
     ):  # pylint: disable=too-many-arguments
         '''@brief get the specified controller object from the list of controllers'''
-        cid = {
-            'transport': transport,
-            'traddr': traddr,
-            'trsvcid': trsvcid,
-            'subsysnqn': subsysnqn,
-            'host-traddr': host_traddr,
-            'host-iface': host_iface,
-            'host-nqn': host_nqn,
-        }
-        return self._controllers.get(trid.TID(cid))
+        return self._controllers.get(
+            trid.TID.from_values(transport, traddr, trsvcid, subsysnqn, host_traddr, host_iface, host_nqn)
+        )
 
     def _remove_ctrl_from_dict(self, controller, shutdown=False):
         tid_to_pop = controller.tid
@@ -474,14 +559,15 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         been signalled to stop or restart, in which case it makes no sense to
         proceed with the callback.
         '''
-        return self._cancellable and not self._cancellable.is_cancelled()
+        return not self._dead
 
     def _cancel(self):
         logging.debug('ServiceABC._cancel()')
         if self._alive():
+            self._dead = True
             self._cancellable.cancel()
 
-        for controller in self._controllers.values():
+        for controller in list(self._controllers.values()):  # Snapshot. Safe if the dict changes.
             controller.cancel()
 
     def _stop_hdlr(self):
@@ -492,8 +578,8 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
 
         self._dump_last_known_config(self._controllers)
 
-        if len(self._controllers) == 0:
-            GLib.idle_add(self._exit)
+        if not self._controllers:
+            self._schedule_exit()
         else:
             self._disconnect_all()
 
@@ -506,24 +592,33 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         @param controller: the controller object
         @param success: whether the disconnect operation was successful
         '''
-        logging.debug(
-            'ServiceABC._on_final_disconnect()  - %s | %s: disconnect %s',
-            controller.id,
-            controller.device,
-            'succeeded' if success else 'failed',
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(
+                'ServiceABC._on_final_disconnect()  - %s | %s: disconnect %s',
+                controller.id,
+                controller.device,
+                'succeeded' if success else 'failed',
+            )
 
         self._remove_ctrl_from_dict(controller, True)
         controller.kill()
 
         # When all controllers have disconnected, we can finish the clean up
-        if len(self._controllers) == 0:
-            # Defer exit to the next main loop's idle period.
+        if not self._controllers:
+            self._schedule_exit()
+
+    def _schedule_exit(self):
+        '''@brief Defer exit to the next main loop's idle period. Several
+        disconnect callbacks may find the controller list empty in the same
+        main loop iteration, but _exit() must only run once.'''
+        if not self._exit_scheduled:
+            self._exit_scheduled = True
             GLib.idle_add(self._exit)
 
     def _exit(self):
         logging.debug('ServiceABC._exit()')
         self._release_resources()
+        gutil.WorkerPool().shutdown()  # Don't let stuck operations (e.g. connect) delay the exit
         self._loop.quit()
 
     def _on_config_ctrls(self, *_user_data):
@@ -549,9 +644,28 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
     def _read_lkc(self):
         '''@brief Read Last Known Config from file'''
         try:
-            with open(self._lkc_file, 'rb') as file:
+            with open(self._lkc_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return self._read_legacy_lkc()
+        except ValueError:  # json.JSONDecodeError (e.g. empty file)
+            return None
+
+    def _read_legacy_lkc(self):
+        '''@brief Older versions pickled the Last Known Config. After a
+        software upgrade, that file may still be around. Read it so that
+        existing connections are not forgotten. The file is left in place:
+        it is only used until the JSON file has been written (see
+        _read_lkc()).'''
+        fname = os.path.splitext(self._lkc_file)[0] + '.pickle'
+        try:
+            with open(fname, 'rb') as file:
                 return pickle.load(file)
-        except (FileNotFoundError, AttributeError, EOFError):
+        except FileNotFoundError:
+            return None
+        except Exception as ex:  # pylint: disable=broad-except
+            # A corrupt or incompatible old file must not prevent the daemon from starting
+            logging.error('Unable to read legacy last known config %s: %s', fname, ex)
             return None
 
     def _write_lkc(self, config):
@@ -560,9 +674,9 @@ class ServiceABC(abc.ABC):  # pylint: disable=too-many-instance-attributes
         try:
             # Note that if config is empty we still
             # want to open/close the file to empty it.
-            with open(self._lkc_file, 'wb') as file:
+            with open(self._lkc_file, 'w', encoding='utf-8') as file:
                 if config:
-                    pickle.dump(config, file)
+                    json.dump(config, file)
         except FileNotFoundError as ex:
             logging.error('Unable to save last known config: %s', ex)
 
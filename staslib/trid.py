@@ -9,7 +9,6 @@
 '''This module defines the Transport Identifier Object, which is used
 throughout nvme-stas to uniquely identify a Controller'''
 
-import hashlib
 from staslib import conf
 
 
@@ -19,6 +18,24 @@ class TID:  # pylint: disable=too-many-instance-attributes
     RDMA_IP_PORT = '4420'
     DISC_IP_PORT = '8009'
 
+    _TRANSPORT_KEYS = frozenset(('transport', 'traddr', 'subsysnqn', 'trsvcid', 'host-traddr', 'host-iface'))
+    _DEFAULT_HOST_NQN = object()  # Sentinel: use the host NQN from the system configuration
+
+    __slots__ = (
+        '_transport',
+        '_traddr',
+        '_trsvcid',
+        '_subsysnqn',
+        '_host_traddr',
+        '_host_iface',
+        '_host_nqn',
+        '_cfg',
+        '_key',
+        '_hash',
+        '_id',
+        '_dict',
+    )
+
     def __init__(self, cid: dict):
         '''@param cid: Controller Identifier. A dictionary with the following
         contents.
@@ -46,25 +63,67 @@ class TID:  # pylint: disable=too-many-instance-attributes
             'disable-sqflow':     str, # [optional]
         }
         '''
-        self._cfg = {
-            k: v
-            for k, v in cid.items()
-            if k not in ('transport', 'traddr', 'subsysnqn', 'trsvcid', 'host-traddr', 'host-iface')
-        }
-        self._transport = cid.get('transport', '')
-        self._traddr = cid.get('traddr', '')
-        self._trsvcid = ''
-        if self._transport in ('tcp', 'rdma'):
-            trsvcid = cid.get('trsvcid', None)
-            self._trsvcid = (
-                trsvcid if trsvcid else (TID.RDMA_IP_PORT if self._transport == 'rdma' else TID.DISC_IP_PORT)
-            )
-        sysconf = conf.SysConf()
-        self._host_traddr = cid.get('host-traddr', '')
-        self._host_iface = '' if conf.SvcConf().ignore_iface else cid.get('host-iface', '')
-        self._host_nqn = cid.get('host-nqn', sysconf.hostnqn)
-        self._subsysnqn = cid.get('subsysnqn', '')
-        self._key = (
+        get = cid.get
+        self._setup(
+            get('transport', ''),
+            get('traddr', ''),
+            get('trsvcid', None),
+            get('subsysnqn', ''),
+            get('host-traddr', ''),
+            get('host-iface', ''),
+            cid['host-nqn'] if 'host-nqn' in cid else TID._DEFAULT_HOST_NQN,
+            {k: v for k, v in cid.items() if k not in TID._TRANSPORT_KEYS},
+        )
+
+    @classmethod
+    def from_values(  # pylint: disable=too-many-arguments
+        cls, transport, traddr, trsvcid, subsysnqn, host_traddr='', host_iface='', host_nqn=None
+    ):
+        '''@brief Create a TID directly from its transport parameters (i.e.
+        without building an intermediate Controller Identifier dictionary).
+        @param host_nqn: None to use the host NQN from the system configuration.
+        '''
+        tid = cls.__new__(cls)
+        tid._setup(  # pylint: disable=protected-access
+            transport,
+            traddr,
+            trsvcid,
+            subsysnqn,
+            host_traddr,
+            host_iface,
+            TID._DEFAULT_HOST_NQN if host_nqn is None else host_nqn,
+            {},
+        )
+        return tid
+
+    @staticmethod
+    def make_key(
+        transport, traddr, trsvcid, subsysnqn, host_traddr, host_iface, host_nqn
+    ) -> tuple:  # pylint: disable=too-many-arguments
+        '''@brief Return the key that uniquely identifies a controller. The
+        parameters get normalized the same way they are for TID objects (e.g.
+        default trsvcid). Two TIDs are equal when their keys are equal.
+        '''
+        if transport in ('tcp', 'rdma'):
+            if not trsvcid:
+                trsvcid = TID.RDMA_IP_PORT if transport == 'rdma' else TID.DISC_IP_PORT
+        else:
+            trsvcid = ''
+
+        if conf.SvcConf().ignore_iface:
+            host_iface = ''
+
+        return (transport, traddr, trsvcid, subsysnqn, host_traddr, host_iface, host_nqn)
+
+    def _setup(
+        self, transport, traddr, trsvcid, subsysnqn, host_traddr, host_iface, host_nqn, cfg
+    ):  # pylint: disable=too-many-arguments
+        if host_nqn is TID._DEFAULT_HOST_NQN:
+            host_nqn = conf.SysConf().hostnqn
+
+        self._cfg = cfg
+        self._key = TID.make_key(transport, traddr, trsvcid, subsysnqn, host_traddr, host_iface, host_nqn)
+        (
             self._transport,
             self._traddr,
             self._trsvcid,
@@ -72,11 +131,10 @@ class TID:  # pylint: disable=too-many-instance-attributes
             self._host_traddr,
             self._host_iface,
             self._host_nqn,
-        )
-        self._hash = int.from_bytes(
-            hashlib.md5(''.join(self._key).encode('utf-8')).digest(), 'big'
-        )  # We need a consistent hash between restarts
-        self._id = f'({self._transport}, {self._traddr}, {self._trsvcid}{", " + self._subsysnqn if self._subsysnqn else ""}{", " + self._host_iface if self._host_iface else ""}{", " + self._host_traddr if self._host_traddr else ""})'  # pylint: disable=line-too-long
+        ) = self._key
+        self._hash = hash(self._key)
+        self._id = None  # Printable ID. Built on first use (see __str__).
+        self._dict = None  # Built on first use (see as_dict)
 
     host_traddr = property(lambda self: self._host_traddr)
     host_iface = property(lambda self: self._host_iface)
@@ -86,9 +144,16 @@ class TID:  # pylint: disable=too-many-instance-attributes
     trsvcid = property(lambda self: self._trsvcid)
     traddr = property(lambda self: self._traddr)
     cfg = property(lambda self: self._cfg)
+    key = property(lambda self: self._key)
 
     def as_dict(self):
-        '''Return object members as a dictionary'''
+        '''Return object members as a dictionary. The dictionary is built
+        once (TIDs are immutable) and callers get their own copy of it.'''
+        if self._dict is None:
+            self._dict = self._build_dict()
+        return self._dict.copy()
+
+    def _build_dict(self):
         data = {
             'traddr': self.traddr,
             'trsvcid': self.trsvcid,
@@ -104,16 +169,42 @@ class TID:  # pylint: disable=too-many-instance-attributes
         if cfg:
             data.update(cfg)
 
-        sysconf = conf.SysConf()
-        data['host-nqn'] = getattr(self, '_host_nqn', sysconf.hostnqn)
+        try:
+            data['host-nqn'] = self._host_nqn
+        except AttributeError:
+            data['host-nqn'] = conf.SysConf().hostnqn
 
         return data
 
+    def __setstate__(self, state):
+        '''@brief Restore a pickled TID (see last known config). TIDs pickled
+        by older versions have their members in a __dict__ (no __slots__),
+        possibly with members missing or that no longer exist. Only the
+        transport parameters and cfg are restored. The key and hash are
+        recomputed so that the TID hashes like a freshly created one (older
+        versions used an MD5 hash).
+        '''
+        if isinstance(state, tuple):  # (__dict__, __slots__) state
+            state = {**(state[0] or {}), **(state[1] or {})}
+        get = state.get
+        self._setup(
+            get('_transport', ''),
+            get('_traddr', ''),
+            get('_trsvcid', None),
+            get('_subsysnqn', ''),
+            get('_host_traddr', ''),
+            get('_host_iface', ''),
+            get('_host_nqn', TID._DEFAULT_HOST_NQN),
+            get('_cfg') or {},
+        )
+
     def __str__(self):
+        if self._id is None:
+            self._id = f'({self._transport}, {self._traddr}, {self._trsvcid}{", " + self._subsysnqn if self._subsysnqn else ""}{", " + self._host_iface if self._host_iface else ""}{", " + self._host_traddr if self._host_traddr else ""})'  # pylint: disable=line-too-long
         return self._id
 
     def __repr__(self):
-        return self._id
+        return str(self)
 
     def __eq__(self, other):
         return isinstance(other, self.__class__) and self._key == other._key
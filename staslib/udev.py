@@ -16,6 +16,14 @@ import pyudev
 from gi.repository import GLib
 from staslib import defs, iputil, trid
 
+# Spellings of "none" used by the kernel/udev for undefined values. Checking
+# these first avoids creating a lowercase copy of every value read.
+_NONE_SPELLINGS = frozenset(('none', 'None', 'NONE'))
+
+
+def _is_none(value: str) -> bool:
+    return value in _NONE_SPELLINGS or (len(value) == 4 and value.lower() == 'none')
+
 
 # ******************************************************************************
 class Udev:
@@ -24,11 +32,15 @@ class Udev:
     IT INTERFERES WITH THE pyudev INTERNALS, WHICH CAUSES OBJECT CLEAN UP TO FAIL.
     '''
 
+    DEVICE_CACHE_TTL_SEC = 0.05
+
     def __init__(self):
         self._log_event_soak_time = 0
         self._log_event_count = 0
         self._device_event_registry = dict()
+        self._device_event_registrants = dict()  # Reverse lookup: user_cback -> set of sys_names
         self._action_event_registry = dict()
+        self._device_cache = dict()  # sys_name -> (device, expiry time)
         self._context = pyudev.Context()
         self._monitor = pyudev.Monitor.from_netlink(self._context)
         self._monitor.filter_by(subsystem='nvme')
@@ -52,13 +64,22 @@ class Udev:
         self._monitor = None
         self._context = None
         self._device_event_registry = None
+        self._device_event_registrants = None
         self._action_event_registry = None
+        self._device_cache = None
 
     def get_nvme_device(self, sys_name):
         '''@brief Get the udev device object associated with an nvme device.
         @param sys_name: The device system name (e.g. 'nvme1')
         @return A pyudev.device._device.Device object
         '''
+        try:
+            # Direct sysfs lookup (/sys/class/nvme/[sys_name])
+            return pyudev.Devices.from_name(self._context, 'nvme', sys_name)
+        except pyudev.DeviceNotFoundByNameError:
+            pass
+
+        # Not in the "nvme" class. Fall back to looking up the device node.
         device_node = os.path.join('/dev', sys_name)
         try:
             return pyudev.Devices.from_device_file(self._context, device_node)
@@ -94,27 +115,45 @@ class Udev:
         '''
         if sys_name:
             self._device_event_registry[sys_name] = user_cback
+            self._device_event_registrants.setdefault(user_cback, set()).add(sys_name)
 
     def unregister_for_device_events(self, user_cback):
         '''@brief The opposite of register_for_device_events()'''
-        entries = list(self._device_event_registry.items())
-        for sys_name, _user_cback in entries:
-            if user_cback == _user_cback:
-                self._device_event_registry.pop(sys_name, None)
-                break
+        for sys_name in self._device_event_registrants.pop(user_cback, ()):
+            # The device may have been re-registered with a different callback since
+            if self._device_event_registry.get(sys_name) == user_cback:
+                self._device_event_registry.pop(sys_name)
+
+    def _get_cached_nvme_device(self, sys_name):
+        '''@brief Same as get_nvme_device(), but reuse the device object
+        looked up by a recent call (less than DEVICE_CACHE_TTL_SEC ago).
+        Entries are also invalidated when a udev event is received for the
+        device. This avoids reopening the device node when attributes are
+        queried in bursts (e.g. when D-Bus clients poll all controllers).
+        '''
+        now = time.monotonic()
+        device, expiry = self._device_cache.get(sys_name, (None, 0))
+        if now >= expiry:
+            device = self.get_nvme_device(sys_name)
+            if device is None:
+                self._device_cache.pop(sys_name, None)
+            else:
+                self._device_cache[sys_name] = (device, now + self.DEVICE_CACHE_TTL_SEC)
+        return device
 
     def get_attributes(self, sys_name: str, attr_ids) -> dict:
         '''@brief Get all the attributes associated with device @sys_name'''
         attrs = {attr_id: '' for attr_id in attr_ids}
         if sys_name and sys_name != 'nvme?':
-            udev = self.get_nvme_device(sys_name)
+            udev = self._get_cached_nvme_device(sys_name)
             if udev is not None:
+                get = udev.attributes.get  # A new Attributes object is created each time .attributes is read
                 for attr_id in attr_ids:
-                    try:
-                        value = udev.attributes.asstring(attr_id).strip()
-                        attrs[attr_id] = '' if value == '(efault)' else value
-                    except Exception:  # pylint: disable=broad-except
-                        pass
+                    value = get(attr_id)
+                    if value is not None:
+                        value = value.decode(errors='replace').strip()
+                        if value != '(efault)':
+                            attrs[attr_id] = value
 
         return attrs
 
@@ -132,8 +171,9 @@ class Udev:
             return True
 
         # Imply Discovery controller based on the absence of children.
-        # Discovery Controllers have no children devices
-        if len(list(device.children)) == 0:
+        # Discovery Controllers have no children devices. Only the
+        # first child is needed to decide, so don't walk them all.
+        if next(iter(device.children), None) is None:
             return True
 
         return False
@@ -149,7 +189,7 @@ class Udev:
 
         # Imply I/O controller based on the presence of children.
         # I/O Controllers have children devices
-        if len(list(device.children)) != 0:
+        if next(iter(device.children), None) is not None:
             return True
 
         return False
@@ -315,6 +355,18 @@ class Udev:
 
         return True
 
+    @staticmethod
+    def _may_match_tid(tid, device):
+        '''@brief Cheap pre-check done before reading the full Connection ID
+        of a device. Only checks the mandatory parameters that cannot be
+        filtered by list_devices() (i.e. they are not udev properties).
+        @return False if the device cannot match @tid, True otherwise.
+        '''
+        attrs = device.attributes
+        if tid.host_nqn != Udev._get_attribute(attrs, 'hostnqn'):
+            return False
+        return tid.subsysnqn in (defs.WELL_KNOWN_DISC_NQN, Udev._get_attribute(attrs, 'subsysnqn'))
+
     def find_nvme_dc_device(self, tid):
         '''@brief  Find the nvme device associated with the specified
                 Discovery Controller.
@@ -326,6 +378,9 @@ class Udev:
         if devices:
             ifaces = iputil.net_if_addrs()
             for device in devices:
+                if not self._may_match_tid(tid, device):
+                    continue
+
                 if not self.is_dc_device(device):
                     continue
 
@@ -348,6 +403,9 @@ class Udev:
         if devices:
             ifaces = iputil.net_if_addrs()
             for device in devices:
+                if not self._may_match_tid(tid, device):
+                    continue
+
                 if not self.is_ioc_device(device):
                     continue
 
@@ -397,6 +455,7 @@ class Udev:
 
     def __handle_events(self):
         event_count = 0
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         read_device = partial(self._monitor.poll, timeout=0)
         for device in iter(read_device, None):
             if device is None:  # This should never happen,...
@@ -404,16 +463,19 @@ class Udev:
 
             event_count += 1
 
+            self._device_cache.pop(device.sys_name, None)
+
             action_cbacks = self._action_event_registry.get(device.action, None)
             device_cback = self._device_event_registry.get(device.sys_name, None)
             if action_cbacks or device_cback:
-                logging.debug(
-                    'Udev.__handle_events()             - %-7s %-6s  %2s:%s',
-                    device.sys_name,
-                    device.action,
-                    event_count,
-                    device.sequence_number,
-                )
+                if debug:
+                    logging.debug(
+                        'Udev.__handle_events()             - %-7s %-6s  %2s:%s',
+                        device.sys_name,
+                        device.action,
+                        event_count,
+                        device.sequence_number,
+                    )
 
                 if action_cbacks:
                     for action_cback in action_cbacks:
@@ -422,19 +484,23 @@ class Udev:
                 if device_cback is not None:
                     GLib.idle_add(device_cback, device)
 
+    # pyudev builds a new Properties (Attributes) object every time
+    # device.properties (device.attributes) is read. The helpers below take
+    # that object so that callers reading several values only build it once.
     @staticmethod
-    def _get_property(device, prop, default=''):
-        prop = device.properties.get(prop, default)
-        return '' if prop.lower() == 'none' else prop
+    def _get_property(props, prop, default=''):
+        '''@brief Get a property that the kernel reports as "none" when undefined
+        @param props: The device's properties (i.e. device.properties)
+        '''
+        prop = props.get(prop, default)
+        return '' if _is_none(prop) else prop
 
     @staticmethod
-    def _get_attribute(device, attr_id, default=''):
-        try:
-            attr = device.attributes.asstring(attr_id).strip()
-        except Exception:  # pylint: disable=broad-except
-            attr = default
-
-        return '' if attr.lower() == 'none' else attr
+    def _get_attribute(attrs, attr_id, default=''):
+        '''@param attrs: The device's attributes (i.e. device.attributes)'''
+        attr = attrs.get(attr_id)
+        attr = default if attr is None else attr.decode(errors='replace').strip()
+        return '' if _is_none(attr) else attr
 
     @staticmethod
     def get_key_from_attr(device, attr, key, delim=','):
@@ -447,7 +513,7 @@ class Udev:
         @example:
             "address" attribute contains "trtype=tcp,traddr=10.10.1.100,trsvcid=4420,host_traddr=10.10.1.50"
         '''
-        attr_str = Udev._get_attribute(device, attr)
+        attr_str = Udev._get_attribute(device.attributes, attr)
         if not attr_str:
             return ''
 
@@ -467,29 +533,44 @@ class Udev:
     @staticmethod
     def get_tid(device, ifaces):
         '''@brief return the Transport ID associated with a udev device'''
-        cid = Udev.get_cid(device)
-        if cid['transport'] == 'tcp':
-            src_addr = cid['src-addr']
-            if not cid['host-iface'] and src_addr:
-                # We'll try to find the interface from the source address on
-                # the connection. Only available if kernel exposes the source
-                # address (src_addr) in the "address" attribute.
-                cid['host-iface'] = iputil.get_interface(ifaces, iputil.get_ipaddress_obj(src_addr))
-
-        return trid.TID(cid)
+        props = device.properties
+        attrs = device.attributes
+        transport = props.get('NVME_TRTYPE', '')
+        host_iface = Udev._get_property(props, 'NVME_HOST_IFACE')
+        if transport == 'tcp' and not host_iface:
+            # We'll try to find the interface from the source address on
+            # the connection. Only available if kernel exposes the source
+            # address (src_addr) in the "address" attribute.
+            src_addr = Udev.get_key_from_attr(device, 'address', 'src_addr=')
+            if src_addr:
+                host_iface = iputil.get_interface(ifaces, iputil.get_ipaddress_obj(src_addr))
+
+        return trid.TID(
+            {
+                'transport': transport,
+                'traddr': props.get('NVME_TRADDR', ''),
+                'trsvcid': Udev._get_property(props, 'NVME_TRSVCID'),
+                'host-traddr': Udev._get_property(props, 'NVME_HOST_TRADDR'),
+                'host-iface': host_iface,
+                'subsysnqn': Udev._get_attribute(attrs, 'subsysnqn'),
+                'host-nqn': Udev._get_attribute(attrs, 'hostnqn'),
+            }
+        )
 
     @staticmethod
     def get_cid(device):
         '''@brief return the Connection ID associated with a udev device'''
+        props = device.properties
+        attrs = device.attributes
         cid = {
-            'transport': Udev._get_property(device, 'NVME_TRTYPE'),
-            'traddr': Udev._get_property(device, 'NVME_TRADDR'),
-            'trsvcid': Udev._get_property(device, 'NVME_TRSVCID'),
-            'host-traddr': Udev._get_property(device, 'NVME_HOST_TRADDR'),
-            'host-iface': Udev._get_property(device, 'NVME_HOST_IFACE'),
-            'subsysnqn': Udev._get_attribute(device, 'subsysnqn'),
+            'transport': props.get('NVME_TRTYPE', ''),
+            'traddr': props.get('NVME_TRADDR', ''),
+            'trsvcid': Udev._get_property(props, 'NVME_TRSVCID'),
+            'host-traddr': Udev._get_property(props, 'NVME_HOST_TRADDR'),
+            'host-iface': Udev._get_property(props, 'NVME_HOST_IFACE'),
+            'subsysnqn': Udev._get_attribute(attrs, 'subsysnqn'),
             'src-addr': Udev.get_key_from_attr(device, 'address', 'src_addr='),
-            'host-nqn': Udev._get_attribute(device, 'hostnqn'),
+            'host-nqn': Udev._get_attribute(attrs, 'hostnqn'),
         }
         return cid
 
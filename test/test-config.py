@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 import os
+import tempfile
 import unittest
 from staslib import conf
 
@@ -109,6 +110,12 @@ class StasProcessConfUnitTest(unittest.TestCase):
 
         self.assertEqual(service_conf.get_excluded(), [{'transport': 'tcp', 'traddr': '10.10.10.10'}])
 
+        # Modifying a returned list must not alter the cached configuration
+        service_conf.get_excluded().append({'transport': 'rdma'})
+        service_conf.get_option('Controllers', 'exclude').append('transport=rdma')
+        self.assertEqual(service_conf.get_excluded(), [{'transport': 'tcp', 'traddr': '10.10.10.10'}])
+        self.assertEqual(len(service_conf.get_option('Controllers', 'exclude')), 1)
+
         stypes = service_conf.stypes
         self.assertIn('_nvme-disc._tcp', stypes)
 
@@ -157,6 +164,62 @@ class StasProcessConfUnitTest(unittest.TestCase):
 
         self.assertRaises(KeyError, service_conf.get_option, 'Babylon', 5)
 
+    def test__parse_controller(self):
+        self.assertEqual(
+            conf._parse_controller(' transport = tcp ;traddr=1.1.1.1;; junk; kato=;'),
+            {'transport': 'tcp', 'traddr': '1.1.1.1', 'kato': ''},
+        )
+        self.assertEqual(
+            conf._parse_controller('dhchap-ctrl-secret=DHHC-1:00:c2VjcmV0==:'),
+            {'dhchap-ctrl-secret': 'DHHC-1:00:c2VjcmV0==:'},
+        )
+
+    def test__read_ini(self):
+        data = [
+            'ignored=before any section\n',
+            '# comment\n',
+            '[Controllers]\n',
+            'Controller = transport=tcp;traddr=1.1.1.1\n',
+            '\n',
+            'controller=transport=tcp;traddr=2.2.2.2\n',
+            '    transport=tcp;traddr=3.3.3.3\n',
+            '; comment\n',
+            'exclude\n',
+            '[Global]\n',
+            'kato=30\n',
+            '[Controllers]\n',
+            'controller=transport=tcp;traddr=4.4.4.4\n',
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'stas.conf')
+            with open(fname, 'w') as f:  # pylint: disable=unspecified-encoding
+                f.writelines(data)
+
+            with self.assertLogs(level='WARNING') as captured:
+                config = conf._read_ini(fname)
+            self.assertEqual(len(captured.records), 1)
+            self.assertIn('line 1', captured.output[0])
+
+            self.assertEqual(
+                config,
+                {
+                    'Controllers': {
+                        'controller': [
+                            'transport=tcp;traddr=1.1.1.1',
+                            'transport=tcp;traddr=2.2.2.2',
+                            'transport=tcp;traddr=3.3.3.3',
+                            'transport=tcp;traddr=4.4.4.4',
+                        ],
+                        'exclude': None,
+                    },
+                    'Global': {'kato': ['30']},
+                },
+            )
+
+            # A file that cannot be read is treated as empty
+            with self.assertLogs(level='ERROR'):
+                self.assertEqual(conf._read_ini(tmpdir), {})
+
     def test__parse_single_val(self):
         self.assertEqual(conf._parse_single_val('hello'), 'hello')
         self.assertIsNone(conf._parse_single_val(None))
@@ -39,5 +39,50 @@ class Test(unittest.TestCase):
         self.assertEqual(str(tmr), '1.0s [0s]')
 
 
+class WheelTimerTest(unittest.TestCase):
+    '''Unit tests for class WheelTimer'''
+
+    def tearDown(self):
+        gutil.TimerWheel.destroy()
+
+    def test_new_timer(self):
+        tmr = gutil.WheelTimer(interval_sec=5)
+        self.assertEqual(tmr.get_timeout(), 5)
+        self.assertEqual(tmr.time_remaining(), 0)
+        self.assertEqual(str(tmr), '5.0s [off]')
+        tmr.set_timeout(new_interval_sec=18)
+        self.assertEqual(tmr.get_timeout(), 18)
+        self.assertEqual(tmr.time_remaining(), 0)
+
+    def test_start_stop_timer(self):
+        tmr = gutil.WheelTimer(interval_sec=10, user_cback=lambda: "ok")
+        tmr.start()
+        self.assertNotEqual(tmr.time_remaining(), 0)
+        self.assertNotEqual(str(tmr), '10.0s [off]')
+        tmr.stop()
+        self.assertEqual(tmr.time_remaining(), 0)
+        self.assertEqual(str(tmr), '10.0s [off]')
+
+    def test_expire(self):
+        fired = []
+        tmr1 = gutil.WheelTimer(10, fired.append, 1)
+        tmr2 = gutil.WheelTimer(10, fired.append, 2)
+        tmr3 = gutil.WheelTimer(10, fired.append, 3)
+        for tmr in (tmr1, tmr2, tmr3):
+            tmr.start()
+            tmr.clear()  # Expire on next tick
+        tmr2.stop()
+        gutil.TimerWheel()._tick()
+        self.assertEqual(fired, [1, 3])
+        self.assertEqual(tmr1.time_remaining(), 0)
+
+    def test_clear(self):
+        tmr = gutil.WheelTimer(interval_sec=100, user_cback=lambda: "ok")
+        tmr.start()
+        tmr.clear()
+        self.assertEqual(tmr.time_remaining(), 0)
+        self.assertEqual(str(tmr), '100.0s [0s]')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 #!/usr/bin/python3
+import time
 import unittest
-from staslib import gutil
+from gi.repository import GLib
+from staslib import gutil, trid
 
 
 class GutilUnitTest(unittest.TestCase):
@@ -28,6 +30,90 @@ class GutilUnitTest(unittest.TestCase):
         op._errmsg = errmsg
         self.assertEqual(op.as_dict().get('error'), errmsg)
 
+    def test_Deferred(self):
+        calls = []
+        deferreds = [gutil.Deferred(calls.append, i) for i in range(3)]
+        for deferred in deferreds:
+            deferred.schedule()
+            deferred.schedule()  # Scheduling twice runs once
+            self.assertTrue(deferred.is_scheduled())
+
+        deferreds[1].cancel()
+        self.assertFalse(deferreds[1].is_scheduled())
+
+        gutil._DeferredBatch()._drain()
+        self.assertEqual(calls, [0, 2])
+        self.assertFalse(any(deferred.is_scheduled() for deferred in deferreds))
+
+        # Large batches are spread over several main loop iterations
+        calls.clear()
+        count = 2 * gutil._DeferredBatch.MAX_PER_TICK + 1
+        deferreds = [gutil.Deferred(calls.append, i) for i in range(count)]
+        for deferred in deferreds:
+            deferred.schedule()
+
+        self.assertTrue(gutil._DeferredBatch()._drain())
+        self.assertEqual(calls, list(range(gutil._DeferredBatch.MAX_PER_TICK)))
+        while gutil._DeferredBatch()._drain():
+            pass
+        self.assertEqual(calls, list(range(count)))
+
+        # A failing call must not prevent the others from running, nor
+        # prevent Deferred objects from being scheduled afterwards.
+        def fail():
+            raise RuntimeError('Deferred call failure')
+
+        calls.clear()
+        deferreds = [gutil.Deferred(calls.append, 0), gutil.Deferred(fail), gutil.Deferred(calls.append, 2)]
+        for deferred in deferreds:
+            deferred.schedule()
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(gutil._DeferredBatch()._drain())
+        self.assertEqual(calls, [0, 2])
+        self.assertFalse(any(deferred.is_scheduled() for deferred in deferreds))
+
+        deferreds[0].schedule()
+        self.assertIsNotNone(gutil._DeferredBatch()._source_id)
+
+    def test_TimerWheel(self):
+        # A failing callback must not prevent the other timers from
+        # expiring, nor prevent timers from being started afterwards.
+        def fail():
+            raise RuntimeError('Timer callback failure')
+
+        gutil.TimerWheel.destroy()  # Start with an empty wheel
+        calls = []
+        timers = [gutil.WheelTimer(0, calls.append, 0), gutil.WheelTimer(0, fail), gutil.WheelTimer(0, calls.append, 2)]
+        for timer in timers:
+            timer.start()
+            timer.clear()  # Expire on the next tick
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(gutil.TimerWheel()._tick())
+        self.assertEqual(calls, [0, 2])
+        self.assertIsNone(gutil.TimerWheel()._source_id)
+
+        timers[0].start()
+        self.assertIsNotNone(gutil.TimerWheel()._source_id)
+        timers[0].stop()
+
+    def test_NameResolver_invalid_hostname(self):
+        '''A name that getaddrinfo() rejects with something else than an
+        OSError (here a UnicodeError) must not prevent the callback'''
+        results = []
+        tids = [
+            trid.TID({'transport': 'tcp', 'traddr': 'a..b', 'subsysnqn': 'nqn.abc'}),
+            trid.TID({'transport': 'tcp', 'traddr': '1.1.1.1', 'subsysnqn': 'nqn.abc'}),
+        ]
+        gutil.NameResolver().resolve_ctrl_async(None, tids, results.append)
+
+        context = GLib.MainContext.default()
+        deadline = time.monotonic() + 10
+        while not results and time.monotonic() < deadline:
+            if not context.iteration(False):
+                time.sleep(0.01)
+
+        self.assertEqual(results, [[tids[1]]])
+
 
 if __name__ == '__main__':
     unittest.main()
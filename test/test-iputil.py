@@ -78,7 +78,7 @@ class Test(unittest.TestCase):
 
             self.assertEqual(iface['ifname'], iputil.mac2iface(iface['address']))
 
-    def test_remove_invalid_addresses(self):
+    def test_filter_controllers(self):
         good_tcp = trid.TID({'transport': 'tcp', 'traddr': '1.1.1.1', 'subsysnqn': '', 'trsvcid': '8009'})
         bad_tcp = trid.TID({'transport': 'tcp', 'traddr': '555.555.555.555', 'subsysnqn': '', 'trsvcid': '8009'})
         any_fc = trid.TID({'transport': 'fc', 'traddr': 'blah', 'subsysnqn': ''})
@@ -90,7 +90,7 @@ class Test(unittest.TestCase):
             any_fc,
             bad_trtype,
         ]
-        l2 = stas.remove_invalid_addresses(l1)
+        l2 = stas.filter_controllers(l1)  # No exclusions configured
 
         self.assertNotEqual(l1, l2)
 
@@ -100,6 +100,14 @@ class Test(unittest.TestCase):
         self.assertNotIn(bad_tcp, l2)
         self.assertNotIn(bad_trtype, l2)
 
+    def test_ip_version(self):
+        self.assertEqual(4, iputil.ip_version('1.1.1.1'))
+        self.assertEqual(6, iputil.ip_version('fe80::1'))
+        self.assertEqual(6, iputil.ip_version('fe80::1%eth0'))
+        self.assertEqual(6, iputil.ip_version('::ffff:1.1.1.1'))
+        self.assertIsNone(iputil.ip_version('555.555.555.555'))
+        self.assertIsNone(iputil.ip_version('blah'))
+
     def test__data_matches_ip(self):
         self.assertFalse(iputil.ip_equal(None, None))
 
@@ -25,7 +25,8 @@ class StaslibLogTest(TestCase):
         logger = logging.getLogger()
         handler = logger.handlers[-1]
 
-        self.assertIsInstance(handler, systemd.journal.JournalHandler)
+        self.assertIsInstance(handler, logging.handlers.QueueHandler)
+        self.assertIsInstance(handler.listener.handlers[0], systemd.journal.JournalHandler)
 
         self.assertEqual(log.level(), 'INFO')
 
@@ -61,7 +62,8 @@ class StaslibLogTest(TestCase):
         logger = logging.getLogger()
         handler = logger.handlers[-1]
 
-        self.assertIsInstance(handler, logging.handlers.SysLogHandler)
+        self.assertIsInstance(handler, logging.handlers.QueueHandler)
+        self.assertIsInstance(handler.listener.handlers[0], logging.handlers.SysLogHandler)
 
         self.assertEqual(log.level(), 'INFO')
 
@@ -1,4 +1,6 @@
 #!/usr/bin/python3
+import hashlib
+import pickle
 import unittest
 from staslib import trid
 
@@ -43,6 +45,23 @@ class Test(unittest.TestCase):
         '''Check that a hash exists'''
         self.assertIsInstance(self.tid._hash, int)
 
+    def test_key(self):
+        '''Check that a TID is identified by its key'''
+        key = trid.TID.make_key(
+            Test.TRANSPORT, Test.TRADDR, '', Test.SUBSYSNQN, Test.HOST_TRADDR, Test.HOST_IFACE, Test.HOST_NQN
+        )
+        self.assertEqual(self.tid.key, key)
+        self.assertNotEqual(self.other_tid.key, key)
+
+        # Only TIDs compare equal to TIDs, not bare tuples
+        self.assertNotEqual(self.tid, key)
+        self.assertIsNone({self.tid: self}.get(key))
+
+        tid = trid.TID.from_values(
+            Test.TRANSPORT, Test.TRADDR, '', Test.SUBSYSNQN, Test.HOST_TRADDR, Test.HOST_IFACE, Test.HOST_NQN
+        )
+        self.assertIs({self.tid: self}.get(tid), self)
+
     def test_transport(self):
         '''Check that transport is set'''
         self.assertEqual(self.tid.transport, Test.TRANSPORT)
@@ -85,6 +104,46 @@ class Test(unittest.TestCase):
         self.assertNotEqual(self.tid, self.other_tid)
         self.assertNotEqual(self.tid, 'hello')
 
+    def test_pickle(self):
+        '''Check that a TID survives being saved to the last known config'''
+        tid = pickle.loads(pickle.dumps(self.tid))
+        self.assertEqual(self.tid, tid)
+        self.assertEqual(hash(self.tid), hash(tid))
+        self.assertDictEqual(self.tid.as_dict(), tid.as_dict())
+
+        # TIDs pickled by older versions carry a plain __dict__ and an MD5 hash
+        key = (
+            Test.TRANSPORT,
+            Test.TRADDR,
+            Test.TRSVCID,
+            Test.SUBSYSNQN,
+            Test.HOST_TRADDR,
+            Test.HOST_IFACE,
+            Test.HOST_NQN,
+        )
+        old = trid.TID.__new__(trid.TID)
+        old.__setstate__(
+            {
+                '_cfg': {},
+                '_transport': Test.TRANSPORT,
+                '_traddr': Test.TRADDR,
+                '_trsvcid': Test.TRSVCID,
+                '_host_traddr': Test.HOST_TRADDR,
+                '_host_iface': Test.HOST_IFACE,
+                '_host_nqn': Test.HOST_NQN,
+                '_subsysnqn': Test.SUBSYSNQN,
+                '_key': key,
+                '_hash': int.from_bytes(hashlib.md5(''.join(key).encode('utf-8')).digest(), 'big'),
+                '_id': f'({Test.TRANSPORT}, {Test.TRADDR}, {Test.TRSVCID}, {Test.SUBSYSNQN})',
+            }
+        )
+        fresh = trid.TID(old.as_dict())
+        self.assertEqual(old, fresh)
+        self.assertEqual(hash(old), hash(fresh))
+        self.assertIs({old: self}.get(fresh), self)
+        self.assertEqual(old, self.tid)
+        self.assertEqual(str(old), str(self.tid))
+
 
 if __name__ == '__main__':
     unittest.main()